@@ -0,0 +1,96 @@
+# CodingAssistant/code_analysis/ast_cache.py
+import hashlib
+import logging
+import os
+import pickle
+import sys
+from pathlib import Path
+
+# Bump whenever the shape of the cached entity lists changes
+SCHEMA_VERSION = 3
+
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'coding-assistant' / 'ast-cache'
+
+class ASTCache:
+    """
+    Persistent on-disk cache of entities extracted from Python sources
+
+    Entries are keyed by content alone, so they are shared between paths,
+    worktrees and checkouts, which the path-keyed IncrementalIndex cannot do.
+    Nothing prunes the directory and every edited version of a file adds an
+    entry, which is why the cache is opt-in (`enable_ast_cache`).
+    """
+    def __init__(self, cache_dir=None):
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else DEFAULT_CACHE_DIR
+
+    @staticmethod
+    def key(source, backend='ast'):
+        """
+        Build the cache key for a source file
+
+        Args:
+            source (bytes): Raw source bytes
+            backend (str, optional): Parser that extracted the entities
+
+        Returns:
+            str: Hex digest covering the source, Python version, schema version and backend
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{sys.version_info[0]}.{sys.version_info[1]}:{SCHEMA_VERSION}:{backend}:".encode())
+        digest.update(source)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / key[:2] / f"{key[2:]}.pkl"
+
+    def get(self, key):
+        """
+        Load cached entities
+
+        Args:
+            key (str): Cache key from `key()`
+
+        Returns:
+            dict: Entity lists, or None on a miss
+        """
+        try:
+            with open(self._entry_path(key), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.debug(f"Ignoring unreadable AST cache entry {key}: {e}")
+            return None
+
+    def put(self, key, entities):
+        """
+        Store entities for a source file
+
+        Args:
+            key (str): Cache key from `key()`
+            entities (dict): Entity lists extracted from the source
+
+        Returns:
+            bool: Success
+        """
+        entry_path = self._entry_path(key)
+        tmp_path = entry_path.with_name(f"{entry_path.name}.{os.getpid()}.tmp")
+
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entities, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            # Atomic so concurrent writers never expose a partial entry
+            os.replace(tmp_path, entry_path)
+            return True
+
+        except Exception as e:
+            self.logger.warning(f"Error writing AST cache entry {key}: {e}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return False
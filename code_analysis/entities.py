@@ -0,0 +1,57 @@
+# CodingAssistant/code_analysis/entities.py
+from array import array
+from typing import NamedTuple, Optional, Tuple
+
+class ClassEntity(NamedTuple):
+    """A class definition"""
+    name: str
+    line: int
+    methods: Tuple[str, ...]
+    bases: Tuple[str, ...]
+    file: Optional[str] = None
+    kind = 'class'
+
+
+class FunctionEntity(NamedTuple):
+    """A function defined outside any class"""
+    name: str
+    line: int
+    args: Tuple[str, ...]
+    file: Optional[str] = None
+    kind = 'function'
+
+
+class ImportEntity(NamedTuple):
+    """An import statement; module is None for plain `import x`"""
+    line: int
+    module: Optional[str]
+    names: Tuple[str, ...]
+    file: Optional[str] = None
+    kind = 'import'
+
+
+class VariableEntity(NamedTuple):
+    """A name bound by a plain assignment"""
+    name: str
+    line: int
+    file: Optional[str] = None
+    kind = 'variable'
+
+
+def to_columns(entities):
+    """
+    Convert entity records to a column-per-field layout for bulk processing
+
+    Args:
+        entities (list): Records of a single entity type
+
+    Returns:
+        dict: Field name -> list of values, with `line` as a compact array('I')
+    """
+    if not entities:
+        return {}
+
+    fields = type(entities[0])._fields
+    columns = dict(zip(fields, (list(column) for column in zip(*entities))))
+    columns['line'] = array('I', columns['line'])
+    return columns
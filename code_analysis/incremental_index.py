@@ -0,0 +1,140 @@
+# CodingAssistant/code_analysis/incremental_index.py
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from pathlib import Path
+
+DEFAULT_INDEX_PATH = Path.home() / '.cache' / 'coding-assistant' / 'incremental.sqlite'
+
+class IncrementalIndex:
+    """
+    Per-file analysis results keyed by path, reused until the file changes
+
+    A file whose size and mtime match the stored row is not read at all. When
+    only the stat changed (touch, checkout) the stored content hash decides.
+    Results are grouped by namespace so different analyses share one database.
+    """
+    def __init__(self, db_path=None):
+        self.logger = logging.getLogger(__name__)
+        self.db_path = Path(db_path).expanduser() if db_path else DEFAULT_INDEX_PATH
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        """Open the database on first use, so unused indexes cost nothing"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "namespace TEXT, path TEXT, size INTEGER, mtime_ns INTEGER, digest TEXT, data BLOB, "
+                "PRIMARY KEY (namespace, path))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def digest(source):
+        """Content hash of source bytes"""
+        return hashlib.sha256(source).hexdigest()
+
+    def lookup(self, namespace, path, size, mtime_ns, source=None):
+        """
+        Get the stored result for a file if it has not changed
+
+        Args:
+            namespace (str): Analysis the result belongs to
+            path (str): File path
+            size (int): Current file size
+            mtime_ns (int): Current modification time
+            source (bytes, optional): File contents, to compare hashes when the stat differs
+
+        Returns:
+            any: Stored result, or None if the file is new or changed
+        """
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    "SELECT size, mtime_ns, digest, data FROM files WHERE namespace = ? AND path = ?",
+                    (namespace, path)
+                ).fetchone()
+
+                if row is not None:
+                    if (row[0], row[1]) == (size, mtime_ns):
+                        return pickle.loads(row[3])
+
+                    if source is not None and self.digest(source) == row[2]:
+                        # Same content under a new stat; remember it for the fast path
+                        self._conn.execute(
+                            "UPDATE files SET size = ?, mtime_ns = ? WHERE namespace = ? AND path = ?",
+                            (size, mtime_ns, namespace, path)
+                        )
+                        return pickle.loads(row[3])
+
+                return None
+
+        except Exception as e:
+            self.logger.debug(f"Ignoring unreadable incremental index entry {path}: {e}")
+            return None
+
+    def store(self, namespace, path, size, mtime_ns, digest, data):
+        """
+        Store the result for a file
+
+        Args:
+            namespace (str): Analysis the result belongs to
+            path (str): File path
+            size (int): File size
+            mtime_ns (int): Modification time
+            digest (str): Content hash from `digest()`
+            data (any): Picklable result
+        """
+        try:
+            with self._lock:
+                self._connection().execute(
+                    "INSERT OR REPLACE INTO files (namespace, path, size, mtime_ns, digest, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, path, size, mtime_ns, digest,
+                     pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+                )
+        except Exception as e:
+            self.logger.warning(f"Error writing incremental index entry {path}: {e}")
+
+    def commit(self):
+        """Flush pending writes"""
+        try:
+            with self._lock:
+                if self._conn is not None:
+                    self._conn.commit()
+        except Exception as e:
+            self.logger.warning(f"Error committing incremental index: {e}")
+
+
+def path_keys(repo_path):
+    """
+    Build the function mapping file paths under a repository to index keys
+
+    Keys are resolved absolute paths, so rows do not depend on the working
+    directory or on how the repository path was spelled, and different
+    checkouts never share rows. The repository path is resolved once rather
+    than every file path.
+
+    Args:
+        repo_path (str): Path to the repository, as the files were walked from
+
+    Returns:
+        function: File path -> key
+    """
+    prefix = os.path.join(str(repo_path), '')
+    root = os.path.join(os.path.realpath(repo_path), '')
+
+    def key(path):
+        path = str(path)
+        if path.startswith(prefix):
+            return root + path[len(prefix):]
+        return os.path.realpath(path)
+
+    return key
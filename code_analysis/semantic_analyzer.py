@@ -1,10 +1,44 @@
 # CodingAssistant/code_analysis/semantic_analyzer.py
+import ast
 import logging
 from pathlib import Path
 import os
+import sys
 import subprocess
 import json
 
+from code_analysis.ast_cache import ASTCache, SCHEMA_VERSION
+from code_analysis.entities import ClassEntity, FunctionEntity, ImportEntity, VariableEntity
+from code_analysis.incremental_index import IncrementalIndex, path_keys
+from code_analysis.syntax_parser import SyntaxParser
+from utils.cache_utils import LRUCache, file_cache_key
+from utils.fs import FileInfo, walk_repo, skip_dirs_from_config, read_files, relative_path
+from utils.process_pool import get_process_pool, shutdown_process_pool
+
+# Entities of recently analyzed files, shared across analyzer instances
+_entity_cache = LRUCache()
+
+# Per-process tree-sitter parser for pool workers, created on first use
+_worker_syntax_parser = None
+
+# Entity list names in the results, mapped to the 'kind' tag of each entity
+ENTITY_KINDS = {
+    'classes': 'class',
+    'functions': 'function',
+    'imports': 'import',
+    'variables': 'variable'
+}
+
+# Entity-bearing nodes captured in a single pass over the tree-sitter tree
+PYTHON_ENTITY_QUERY = """
+(class_definition) @class
+(function_definition) @function
+(import_statement) @import
+(import_from_statement) @import_from
+(future_import_statement) @import_from
+(assignment) @assignment
+"""
+
 class SemanticAnalyzer:
     """
     Analyzes code semantics to understand meaning and relationships
@@ -19,13 +53,47 @@ class SemanticAnalyzer:
             'java': self._analyze_java,
             'csharp': self._analyze_csharp
         }
+        self.language_extensions = {
+            'python': ['.py'],
+            'javascript': ['.js', '.jsx'],
+            'typescript': ['.ts', '.tsx'],
+            'java': ['.java'],
+            'csharp': ['.cs'],
+            'cpp': ['.cpp', '.hpp', '.cc', '.hh'],
+            'c': ['.c', '.h'],
+            'go': ['.go'],
+            'rust': ['.rs'],
+            'php': ['.php']
+        }
+        self._ext_to_lang = {ext: lang for lang, exts in self.language_extensions.items() for ext in exts}
+        self.ast_cache = None
+        if config.get('enable_ast_cache', False):
+            self.ast_cache = ASTCache(config.get('ast_cache_dir'))
+        _entity_cache.resize(config.get('lru_cache_size', 2048))
+        self.lru_max_file_bytes = config.get('lru_max_file_size_mb', 4) * 1024 * 1024
+        self.skip_dirs = skip_dirs_from_config(config)
+        self.syntax_parser = None
+        if config.get('python_parser', 'tree-sitter') == 'tree-sitter':
+            syntax_parser = SyntaxParser(config)
+            if 'python' in syntax_parser.languages:
+                self.syntax_parser = syntax_parser
+            else:
+                self.logger.info("tree-sitter-python not installed, using the ast module for Python")
+        self.incremental_index = None
+        if config.get('enable_incremental_index', False):
+            self.incremental_index = IncrementalIndex(config.get('incremental_index_path'))
+        backend = 'tree-sitter' if self.syntax_parser else 'ast'
+        self._index_namespace = f"python:{backend}:{SCHEMA_VERSION}"
         
-    def analyze_repository(self, repo_path):
+    def analyze_repository(self, repo_path, files=None, sink=None):
         """
         Perform semantic analysis on a repository
         
         Args:
             repo_path (str): Path to the repository
+            files (list, optional): FileInfo list from walk_repo, to share one traversal
+            sink (callable, optional): Receives each entity as it is extracted instead of
+                holding them all in the results (e.g. to write them to disk)
             
         Returns:
             dict: Semantic analysis results
@@ -41,12 +109,14 @@ class SemanticAnalyzer:
         
         try:
             repo_path = Path(repo_path)
-            language_files = self._categorize_files(repo_path)
+            if files is None:
+                files = walk_repo(repo_path, self.skip_dirs)
+            language_files = self._categorize_files(files)
             
             # Analyze files for each language
             for language, files in language_files.items():
                 if language in self.language_handlers:
-                    language_results = self.language_handlers[language](repo_path, files)
+                    language_results = self.language_handlers[language](repo_path, files, sink)
                     results['by_language'][language] = language_results
                     results['total_files'] += language_results['total_files']
                     results['analyzed_files'] += language_results['analyzed_files']
@@ -61,113 +131,186 @@ class SemanticAnalyzer:
             self.logger.error(f"Error during semantic analysis: {e}")
             return None
             
-    def _categorize_files(self, repo_path):
+    def _categorize_files(self, files):
         """Categorize files by programming language"""
-        language_extensions = {
-            'python': ['.py'],
-            'javascript': ['.js', '.jsx'],
-            'typescript': ['.ts', '.tsx'],
-            'java': ['.java'],
-            'csharp': ['.cs'],
-            'cpp': ['.cpp', '.hpp', '.cc', '.hh'],
-            'c': ['.c', '.h'],
-            'go': ['.go'],
-            'rust': ['.rs'],
-            'php': ['.php']
-        }
-        
-        language_files = {lang: [] for lang in language_extensions}
+        language_files = {lang: [] for lang in self.language_extensions}
         
-        for path in repo_path.rglob('*'):
-            if path.is_file() and '.git' not in str(path):
-                extension = path.suffix.lower()
-                for language, extensions in language_extensions.items():
-                    if extension in extensions:
-                        language_files[language].append(path)
-                        break
-                        
+        for info in files:
+            language = self._ext_to_lang.get(info.suffix)
+            if language:
+                language_files[language].append(info)
+                
         return language_files
         
-    def _analyze_python(self, repo_path, files):
-        """Analyze Python files"""
-        self.logger.info(f"Analyzing {len(files)} Python files")
+    def _analyze_python(self, repo_path, files, sink=None, sources=None):
+        """
+        Analyze Python files
+        
+        Args:
+            repo_path (Path): Path to the repository
+            files (list): FileInfo list of Python files
+            sink (callable, optional): Called with each entity as it is produced. When
+                omitted, entities are collected into per-kind lists under 'entities'
+            sources (list, optional): (name, source bytes) pairs analyzed in memory
+                
+        Returns:
+            dict: File counts, plus the entity lists when no sink was given
+        """
+        sources = sources or []
+        self.logger.info(f"Analyzing {len(files) + len(sources)} Python files")
         
         results = {
-            'total_files': len(files),
+            'total_files': len(files) + len(sources),
             'analyzed_files': 0,
             'error_files': 0,
-            'entities': {
-                'classes': [],
-                'functions': [],
-                'imports': [],
-                'variables': []
-            }
+            'entities': {}
         }
         
-        try:
-            import ast
+        if sink is None:
+            results['entities'] = {group: [] for group in ENTITY_KINDS}
+            lists = {kind: results['entities'][group] for group, kind in ENTITY_KINDS.items()}
+            sink = lambda entity: lists[entity.kind].append(entity)
+            
+        for entity in self._iter_python_entities(repo_path, files, results):
+            sink(entity)
+            
+        for entity in self._iter_python_sources(sources, results):
+            sink(entity)
+            
+        return results
+        
+    def _iter_python_entities(self, repo_path, files, counts):
+        """
+        Yield the entities of Python files one at a time
+        
+        Args:
+            repo_path (Path): Path to the repository
+            files (list): FileInfo list of Python files
+            counts (dict): 'analyzed_files' and 'error_files' are incremented per file
             
-            for file_path in files:
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        source = f.read()
+        Yields:
+            tuple: Entity record from code_analysis.entities, with its file set
+        """
+        # Files unchanged since the last call in this process skip I/O entirely
+        pending = []
+        prefix = os.path.join(str(repo_path), '')
+        index_key = path_keys(repo_path)
+        for info in files:
+            file_path = info.path
+            try:
+                # Computed once per file and shared by every entity it defines
+                rel_path = sys.intern(relative_path(file_path, prefix))
+                
+                lru_key = None
+                if info.size <= self.lru_max_file_bytes:
+                    lru_key = file_cache_key(file_path, info.mtime_ns, info.size)
+                    entities = _entity_cache.get(lru_key)
+                    if entities is not None:
+                        counts['analyzed_files'] += 1
+                        yield from _tag_entities(entities, rel_path)
+                        continue
                         
-                    tree = ast.parse(source)
-                    
-                    # Extract classes, functions, imports, and global variables
-                    for node in ast.walk(tree):
-                        if isinstance(node, ast.ClassDef):
-                            results['entities']['classes'].append({
-                                'name': node.name,
-                                'file': str(file_path.relative_to(repo_path)),
-                                'line': node.lineno,
-                                'methods': [m.name for m in node.body if isinstance(m, ast.FunctionDef)],
-                                'bases': [b.id if isinstance(b, ast.Name) else 'complex' for b in node.bases]
-                            })
-                        elif isinstance(node, ast.FunctionDef) and node.parent_node.type != ast.ClassDef:
-                            results['entities']['functions'].append({
-                                'name': node.name,
-                                'file': str(file_path.relative_to(repo_path)),
-                                'line': node.lineno,
-                                'args': [arg.arg for arg in node.args.args]
-                            })
-                        elif isinstance(node, ast.Import) or isinstance(node, ast.ImportFrom):
-                            if isinstance(node, ast.Import):
-                                module = None
-                                names = [alias.name for alias in node.names]
-                            else:  # ImportFrom
-                                module = node.module
-                                names = [alias.name for alias in node.names]
-                                
-                            results['entities']['imports'].append({
-                                'file': str(file_path.relative_to(repo_path)),
-                                'line': node.lineno,
-                                'module': module,
-                                'names': names
-                            })
-                        elif isinstance(node, ast.Assign) and all(isinstance(target, ast.Name) for target in node.targets):
-                            for target in node.targets:
-                                if isinstance(target, ast.Name):
-                                    results['entities']['variables'].append({
-                                        'name': target.id,
-                                        'file': str(file_path.relative_to(repo_path)),
-                                        'line': node.lineno
-                                    })
-                                    
-                    results['analyzed_files'] += 1
-                    
-                except Exception as e:
-                    self.logger.warning(f"Error analyzing Python file {file_path}: {e}")
-                    results['error_files'] += 1
+                # Files unchanged since the last run skip I/O as well
+                if self.incremental_index:
+                    entities = self.incremental_index.lookup(
+                        self._index_namespace, index_key(file_path), info.size, info.mtime_ns
+                    )
+                    if entities is not None:
+                        if lru_key:
+                            _entity_cache.put(lru_key, entities)
+                        counts['analyzed_files'] += 1
+                        yield from _tag_entities(entities, rel_path)
+                        continue
+                        
+                pending.append((info, rel_path, lru_key))
+                
+            except Exception as e:
+                self.logger.warning(f"Error analyzing Python file {file_path}: {e}")
+                counts['error_files'] += 1
+                
+        # Touched but identical files are matched by content hash; the sources
+        # are read once here and handed on to the parser for the rest
+        to_parse = []
+        sources = read_files([info.path for info, _, _ in pending], self.config.get('io_workers'))
+        for (info, rel_path, lru_key), (_, source, error) in zip(pending, sources):
+            if error is not None:
+                self.logger.warning(f"Error analyzing Python file {info.path}: {error}")
+                counts['error_files'] += 1
+                continue
+                
+            if self.incremental_index:
+                entities = self.incremental_index.lookup(
+                    self._index_namespace, index_key(info.path), info.size, info.mtime_ns, source=source
+                )
+                if entities is not None:
+                    if lru_key:
+                        _entity_cache.put(lru_key, entities)
+                    counts['analyzed_files'] += 1
+                    yield from _tag_entities(entities, rel_path)
+                    continue
                     
-            return results
+            to_parse.append((info, rel_path, lru_key, source))
             
-        except ImportError:
-            self.logger.error("Python ast module not available")
-            results['error_files'] = len(files)
-            return results
+        # Parse the remaining files, in worker processes for large batches
+        outcomes = self._map_python_sources([(info.path, source) for info, _, _, source in to_parse])
+        for (info, rel_path, lru_key, _), (entities, error, digest) in zip(to_parse, outcomes):
+            if error is not None:
+                self.logger.warning(f"Error analyzing Python file {info.path}: {error}")
+                counts['error_files'] += 1
+                continue
+                
+            if lru_key:
+                _entity_cache.put(lru_key, entities)
+            if self.incremental_index:
+                self.incremental_index.store(
+                    self._index_namespace, index_key(info.path), info.size, info.mtime_ns, digest, entities
+                )
+            counts['analyzed_files'] += 1
+            yield from _tag_entities(entities, rel_path)
             
-    def _analyze_javascript(self, repo_path, files):
+        if self.incremental_index:
+            self.incremental_index.commit()
+            self.logger.info(
+                f"Incremental index: {len(files) - len(to_parse)} Python files unchanged, {len(to_parse)} reprocessed"
+            )
+            
+    def _iter_python_sources(self, sources, counts):
+        """Yield the entities of in-memory (name, source bytes) pairs, like _iter_python_entities"""
+        for name, source in sources:
+            # Nothing is cached; snippets are one-off and should not touch disk
+            entities, error, _ = _analyze_python_source(source, None, self.syntax_parser, name)
+            if error is not None:
+                self.logger.warning(f"Error analyzing Python source {name}: {error}")
+                counts['error_files'] += 1
+                continue
+                
+            counts['analyzed_files'] += 1
+            yield from _tag_entities(entities, name)
+            
+    def _map_python_sources(self, sources):
+        """Run _analyze_python_file over (file_path, source) pairs lazily, using the process pool when worthwhile"""
+        use_tree_sitter = self.syntax_parser is not None
+        tasks = [(source, str(file_path), self.ast_cache, use_tree_sitter) for file_path, source in sources]
+        
+        workers = self.config.get('max_workers') or os.cpu_count() or 1
+        if workers > 1 and len(tasks) >= self.config.get('parallel_min_files', 16):
+            done = 0
+            try:
+                pool = get_process_pool(workers)
+                chunksize = max(1, len(tasks) // (workers * 4))
+                for outcome in pool.map(_analyze_python_file, tasks, chunksize=chunksize):
+                    yield outcome
+                    done += 1
+                return
+            except Exception as e:
+                self.logger.warning(f"Parallel Python analysis failed, falling back to serial: {e}")
+                shutdown_process_pool(workers)
+                tasks = tasks[done:]
+                
+        for source, filename, ast_cache, _ in tasks:
+            yield _analyze_python_source(source, ast_cache, self.syntax_parser, filename)
+            
+    def _analyze_javascript(self, repo_path, files, sink=None):
         """Analyze JavaScript files"""
         # Implementation for JavaScript analysis
         return {
@@ -177,7 +320,7 @@ class SemanticAnalyzer:
             'entities': {}
         }
         
-    def _analyze_typescript(self, repo_path, files):
+    def _analyze_typescript(self, repo_path, files, sink=None):
         """Analyze TypeScript files"""
         # Implementation for TypeScript analysis
         return {
@@ -187,7 +330,7 @@ class SemanticAnalyzer:
             'entities': {}
         }
         
-    def _analyze_java(self, repo_path, files):
+    def _analyze_java(self, repo_path, files, sink=None):
         """Analyze Java files"""
         # Implementation for Java analysis
         return {
@@ -197,7 +340,7 @@ class SemanticAnalyzer:
             'entities': {}
         }
         
-    def _analyze_csharp(self, repo_path, files):
+    def _analyze_csharp(self, repo_path, files, sink=None):
         """Analyze C# files"""
         # Implementation for C# analysis
         return {
@@ -223,30 +366,266 @@ class SemanticAnalyzer:
             return None
             
         try:
-            # Use a temporary file for analysis
-            import tempfile
+            name = f"snippet.{language}"
             
-            with tempfile.NamedTemporaryFile(suffix=f'.{language}', mode='w', delete=False) as temp:
-                temp.write(code)
-                temp_path = temp.name
+            # Python is parsed straight from memory, without a temporary file
+            if language == 'python':
+                return self._analyze_python(None, [], sources=[(name, code.encode('utf-8'))])
                 
-            # Create a temporary directory to simulate a repository
-            with tempfile.TemporaryDirectory() as temp_dir:
-                temp_repo = Path(temp_dir)
-                temp_file = temp_repo / f"snippet.{language}"
+            # The other handlers only look at the file list
+            snippet = FileInfo(Path(name), f'.{language}', len(code), 0)
+            return self.language_handlers[language](None, [snippet])
+            
+        except Exception as e:
+            self.logger.error(f"Error analyzing code snippet: {e}")
+            return None
+
+
+class _PythonEntityVisitor(ast.NodeVisitor):
+    """
+    Collects module-level entities without descending into function bodies
+    """
+    def __init__(self):
+        self.entities = {
+            'classes': [],
+            'functions': [],
+            'imports': [],
+            'variables': []
+        }
+        
+    def visit_ClassDef(self, node):
+        # Methods are read straight from the class body; nothing below is visited
+        self.entities['classes'].append(ClassEntity(
+            node.name,
+            node.lineno,
+            tuple(m.name for m in node.body if isinstance(m, (ast.FunctionDef, ast.AsyncFunctionDef))),
+            tuple(b.id if isinstance(b, ast.Name) else 'complex' for b in node.bases)
+        ))
+        
+    def visit_FunctionDef(self, node):
+        # Only reached outside classes, since visit_ClassDef does not recurse
+        self.entities['functions'].append(FunctionEntity(
+            node.name,
+            node.lineno,
+            tuple(arg.arg for arg in node.args.args)
+        ))
+        
+    visit_AsyncFunctionDef = visit_FunctionDef
+    
+    def visit_Import(self, node):
+        self.entities['imports'].append(ImportEntity(
+            node.lineno,
+            None,
+            tuple(alias.name for alias in node.names)
+        ))
+        
+    def visit_ImportFrom(self, node):
+        self.entities['imports'].append(ImportEntity(
+            node.lineno,
+            node.module,
+            tuple(alias.name for alias in node.names)
+        ))
+        
+    def visit_Assign(self, node):
+        if all(isinstance(target, ast.Name) for target in node.targets):
+            for target in node.targets:
+                self.entities['variables'].append(VariableEntity(target.id, node.lineno))
                 
-                with open(temp_file, 'w') as f:
-                    f.write(code)
+    def visit_Expr(self, node):
+        # Expression statements cannot contain entities worth collecting
+        pass
+
+
+def _extract_python_entities(tree):
+    """Extract classes, functions, imports, and global variables from a Python AST"""
+    visitor = _PythonEntityVisitor()
+    visitor.visit(tree)
+    return visitor.entities
+
+
+def _tag_entities(entities, rel_path):
+    """Yield one file's entities with their file set"""
+    for items in entities.values():
+        for item in items:
+            yield item._replace(file=rel_path)
+
+
+def _node_text(node):
+    return node.text.decode('utf-8', 'replace')
+
+
+def _imported_name(node):
+    """Imported module name of a dotted_name or aliased_import node"""
+    if node.type == 'aliased_import':
+        node = node.child_by_field_name('name')
+    return _node_text(node)
+
+
+def _positional_args(parameters):
+    """Names of positional-or-keyword parameters, matching ast's args.args"""
+    args = []
+    for param in parameters.named_children:
+        if param.type == 'identifier':
+            args.append(_node_text(param))
+        elif param.type in ('default_parameter', 'typed_default_parameter'):
+            args.append(_node_text(param.child_by_field_name('name')))
+        elif param.type == 'typed_parameter':
+            name = param.named_children[0]
+            if name.type != 'identifier':
+                break
+            args.append(_node_text(name))
+        elif param.type == 'positional_separator':
+            # Everything before '/' is positional-only
+            args = []
+        elif param.type in ('list_splat_pattern', 'dictionary_splat_pattern', 'keyword_separator'):
+            break
+    return args
+
+
+def _entities_from_captures(captures):
+    """Build the same entity lists as _extract_python_entities from PYTHON_ENTITY_QUERY captures"""
+    entities = {
+        'classes': [],
+        'functions': [],
+        'imports': [],
+        'variables': []
+    }
+    
+    # Captures are in document order, so anything starting before the end of the
+    # last collected class or function is inside its body and is skipped
+    body_end = -1
+    for kind, node in captures:
+        if node.start_byte < body_end:
+            continue
+        line = node.start_point[0] + 1
+        
+        if kind == 'class':
+            body_end = node.end_byte
+            methods = []
+            for child in node.child_by_field_name('body').named_children:
+                if child.type == 'decorated_definition':
+                    child = child.child_by_field_name('definition')
+                if child.type == 'function_definition':
+                    methods.append(_node_text(child.child_by_field_name('name')))
+                    
+            bases = []
+            superclasses = node.child_by_field_name('superclasses')
+            if superclasses is not None:
+                for base in superclasses.named_children:
+                    if base.type in ('keyword_argument', 'comment'):
+                        continue
+                    bases.append(_node_text(base) if base.type == 'identifier' else 'complex')
                     
-                # Call the appropriate language handler
-                results = self.language_handlers[language](temp_repo, [temp_file])
+            entities['classes'].append(ClassEntity(
+                _node_text(node.child_by_field_name('name')),
+                line,
+                tuple(methods),
+                tuple(bases)
+            ))
+            
+        elif kind == 'function':
+            body_end = node.end_byte
+            entities['functions'].append(FunctionEntity(
+                _node_text(node.child_by_field_name('name')),
+                line,
+                tuple(_positional_args(node.child_by_field_name('parameters')))
+            ))
+            
+        elif kind == 'import':
+            entities['imports'].append(ImportEntity(
+                line,
+                None,
+                tuple(_imported_name(name) for name in node.children_by_field_name('name'))
+            ))
+            
+        elif kind == 'import_from':
+            module = node.child_by_field_name('module_name')
+            if module is None:
+                # from __future__ import ... has no module_name field
+                module = node.children[1]
+            elif module.type == 'relative_import':
+                # ast keeps only the dotted part: "from .a import b" has module "a"
+                dotted = [child for child in module.named_children if child.type == 'dotted_name']
+                module = dotted[0] if dotted else None
                 
-                # Clean up
-                os.unlink(temp_path)
+            names = [_imported_name(name) for name in node.children_by_field_name('name')]
+            if any(child.type == 'wildcard_import' for child in node.named_children):
+                names.append('*')
                 
-                return results
+            entities['imports'].append(ImportEntity(
+                line,
+                _node_text(module) if module is not None else None,
+                tuple(names)
+            ))
+            
+        elif kind == 'assignment':
+            # a = b = 1 nests one assignment per target; the outermost one handles the chain
+            if node.parent.type == 'assignment':
+                continue
                 
-        except Exception as e:
-            self.logger.error(f"Error analyzing code snippet: {e}")
-            return None
+            # Annotated assignments are ast.AnnAssign, which the ast visitor skips
+            targets = []
+            while node.type == 'assignment' and node.child_by_field_name('type') is None:
+                targets.append(node.child_by_field_name('left'))
+                node = node.child_by_field_name('right')
+                
+            if targets and all(target.type == 'identifier' for target in targets):
+                for target in targets:
+                    entities['variables'].append(VariableEntity(_node_text(target), line))
+                
+    return entities
+
+
+def _analyze_python_file(task):
+    """
+    Extract entities from a single Python file
+    
+    Module-level so it can be shipped to worker processes.
+    
+    Args:
+        task (tuple): (source bytes, file name, ast_cache, use_tree_sitter) where ast_cache may be None
+        
+    Returns:
+        tuple: (entities, None, digest) on success, (None, error message, None) on failure
+    """
+    global _worker_syntax_parser
+    source, filename, ast_cache, use_tree_sitter = task
+    
+    # Parsers hold native state that cannot be pickled, so each worker builds its own
+    syntax_parser = None
+    if use_tree_sitter:
+        if _worker_syntax_parser is None:
+            _worker_syntax_parser = SyntaxParser({})
+        syntax_parser = _worker_syntax_parser
+        
+    return _analyze_python_source(source, ast_cache, syntax_parser, filename)
 
+
+def _analyze_python_source(source, ast_cache, syntax_parser=None, filename='<unknown>'):
+    """Extract entities from Python source bytes; same return shape as _analyze_python_file"""
+    try:
+        digest = IncrementalIndex.digest(source)
+        
+        # Reuse entities extracted from identical source on an earlier run
+        backend = 'tree-sitter' if syntax_parser else 'ast'
+        cache_key = ast_cache.key(source, backend) if ast_cache else None
+        entities = ast_cache.get(cache_key) if cache_key else None
+        
+        if entities is None:
+            parsed = syntax_parser.parse_and_query(source, 'python', PYTHON_ENTITY_QUERY) if syntax_parser else None
+            
+            # ast both rejects invalid code and covers syntax newer than the grammar
+            if parsed is not None and not parsed[0].root_node.has_error:
+                entities = _entities_from_captures(parsed[1])
+            else:
+                # Straight to an AST, without the flags ast.parse would inherit from this module
+                tree = compile(source, filename, 'exec', flags=ast.PyCF_ONLY_AST, dont_inherit=True)
+                entities = _extract_python_entities(tree)
+                
+            if cache_key:
+                ast_cache.put(cache_key, entities)
+                
+        return entities, None, digest
+        
+    except Exception as e:
+        return None, str(e), None
@@ -4,8 +4,30 @@ from pathlib import Path
 import os
 import subprocess
 import json
+from collections import deque
 from tree_sitter import Language, Parser
 
+try:
+    from tree_sitter import Query, QueryCursor
+except ImportError:
+    # tree-sitter < 0.25 compiles queries on the Language and runs them directly
+    Query = QueryCursor = None
+
+try:
+    import tree_sitter_python
+except ImportError:
+    tree_sitter_python = None
+
+from code_analysis.incremental_index import IncrementalIndex, path_keys
+from utils.cache_utils import LRUCache, file_cache_key
+from utils.fs import walk_repo, skip_dirs_from_config, read_files
+
+# Syntax trees of recently parsed files, shared across parser instances
+_tree_cache = LRUCache()
+
+# Incremental index namespace; bump the version whenever the stored per-file result changes
+_INDEX_NAMESPACE = 'syntax:1'
+
 class SyntaxParser:
     """
     Parses code syntax for multiple programming languages
@@ -14,6 +36,8 @@ class SyntaxParser:
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.parsers = {}
+        self.languages = {}
+        self._queries = {}
         self.language_extensions = {
             'python': ['.py'],
             'javascript': ['.js', '.jsx'],
@@ -25,6 +49,13 @@ class SyntaxParser:
             'rust': ['.rs'],
             'go': ['.go']
         }
+        self._ext_to_lang = {ext: lang for lang, exts in self.language_extensions.items() for ext in exts}
+        _tree_cache.resize(config.get('lru_cache_size', 2048))
+        self.lru_max_file_bytes = config.get('lru_max_file_size_mb', 4) * 1024 * 1024
+        self.skip_dirs = skip_dirs_from_config(config)
+        self.incremental_index = None
+        if config.get('enable_incremental_index', False):
+            self.incremental_index = IncrementalIndex(config.get('incremental_index_path'))
         self._initialize_parsers()
         
     def _initialize_parsers(self):
@@ -54,10 +85,15 @@ class SyntaxParser:
             # JS_LANGUAGE = Language(os.path.join(languages_dir, 'languages.so'), 'javascript')
             # ...
             
+            # Grammars published as wheels (tree-sitter-<language>) are used when installed
+            if tree_sitter_python is not None:
+                self.languages['python'] = Language(tree_sitter_python.language())
+                
             # Create parsers for each language
             for language in ['python', 'javascript', 'typescript', 'java', 'c', 'cpp', 'csharp', 'rust', 'go']:
                 parser = Parser()
-                # parser.set_language(globals()[f"{language.upper()}_LANGUAGE"])
+                if language in self.languages:
+                    parser.language = self.languages[language]
                 self.parsers[language] = parser
                 
             self.logger.info(f"Initialized tree-sitter parsers for {len(self.parsers)} languages")
@@ -65,12 +101,13 @@ class SyntaxParser:
         except Exception as e:
             self.logger.error(f"Error initializing tree-sitter parsers: {e}")
             
-    def parse_repository(self, repo_path):
+    def parse_repository(self, repo_path, files=None):
         """
         Parse syntax for all code files in a repository
         
         Args:
             repo_path (str): Path to the repository
+            files (list, optional): FileInfo list from walk_repo, to share one traversal
             
         Returns:
             dict: Parsed syntax information
@@ -85,33 +122,85 @@ class SyntaxParser:
         }
         
         try:
-            repo_path = Path(repo_path)
+            if files is None:
+                files = walk_repo(repo_path, self.skip_dirs)
             
             # Find all code files in the repository
-            for path in repo_path.rglob('*'):
-                if path.is_file() and '.git' not in str(path) and self._is_code_file(path):
-                    results['total_files'] += 1
-                    
-                    try:
-                        language = self._detect_language(path)
-                        if language and language in self.parsers:
-                            ast = self._parse_file(path, language)
+            code_files = [info for info in files if info.suffix in self._ext_to_lang]
+            results['total_files'] = len(code_files)
+            
+            # Files unchanged since the last run are answered by the incremental index
+            indexed = {}
+            index_key = path_keys(repo_path)
+            if self.incremental_index:
+                for info in code_files:
+                    if not self._is_tree_cached(info):
+                        stored = self.incremental_index.lookup(_INDEX_NAMESPACE, index_key(info.path), info.size, info.mtime_ns)
+                        if stored is not None:
+                            indexed[info.path] = stored
                             
-                            if language not in results['by_language']:
-                                results['by_language'][language] = {
-                                    'files': 0,
-                                    'syntax_errors': 0
-                                }
-                                
-                            results['by_language'][language]['files'] += 1
-                            results['parsed_files'] += 1
+            # Read ahead everything neither cache can answer
+            to_read = deque(
+                info.path for info in code_files
+                if info.path not in indexed and not self._is_tree_cached(info)
+            )
+            sources = read_files(list(to_read), self.config.get('io_workers'))
+            reused = reprocessed = 0
+            
+            for info in code_files:
+                path = info.path
+                try:
+                    source_code = None
+                    if to_read and to_read[0] is path:
+                        to_read.popleft()
+                        _, source_code, error = next(sources)
+                        if error:
+                            raise error
                             
-                            # Additional processing can be done here to store or analyze the AST
+                    language = self._ext_to_lang[info.suffix]
+                    if language in self.parsers:
+                        stored = indexed.get(path)
+                        if stored is None and source_code is not None and self.incremental_index:
+                            # Touched but identical files are matched by content hash
+                            stored = self.incremental_index.lookup(
+                                _INDEX_NAMESPACE, index_key(path), info.size, info.mtime_ns, source=source_code
+                            )
                             
-                    except Exception as e:
-                        self.logger.warning(f"Error parsing file {path}: {e}")
-                        results['error_files'] += 1
+                        if stored is not None:
+                            reused += 1
+                        else:
+                            ast = self._parse_file(info, language, source_code)
+                            stored = {'syntax_error': ast.root_node.has_error}
+                            
+                            if source_code is not None and self.incremental_index:
+                                self.incremental_index.store(
+                                    _INDEX_NAMESPACE, index_key(path), info.size, info.mtime_ns,
+                                    IncrementalIndex.digest(source_code), stored
+                                )
+                                reprocessed += 1
+                                
+                        if language not in results['by_language']:
+                            results['by_language'][language] = {
+                                'files': 0,
+                                'syntax_errors': 0
+                            }
+                            
+                        results['by_language'][language]['files'] += 1
+                        results['by_language'][language]['syntax_errors'] += stored['syntax_error']
+                        results['parsed_files'] += 1
                         
+                        # Additional processing can be done here to store or analyze the AST
+                        
+                except Exception as e:
+                    self.logger.warning(f"Error parsing file {path}: {e}")
+                    results['error_files'] += 1
+                    
+            if self.incremental_index:
+                self.incremental_index.commit()
+                self.logger.info(
+                    f"Incremental index: {reused} files unchanged, {reprocessed} reprocessed"
+                )
+                
             self.logger.info(f"Parsed {results['parsed_files']} files out of {results['total_files']}")
             return results
             
@@ -119,36 +208,39 @@ class SyntaxParser:
             self.logger.error(f"Error during syntax parsing: {e}")
             return None
             
-    def _is_code_file(self, path):
-        """Check if a file is a code file"""
-        extension = path.suffix.lower()
-        for extensions in self.language_extensions.values():
-            if extension in extensions:
-                return True
-        return False
-        
-    def _detect_language(self, path):
-        """Detect the programming language of a file"""
-        extension = path.suffix.lower()
-        for language, extensions in self.language_extensions.items():
-            if extension in extensions:
-                return language
-        return None
+    def _is_tree_cached(self, info):
+        """Check whether _parse_file can answer from the tree cache"""
+        if info.size > self.lru_max_file_bytes:
+            return False
+        return file_cache_key(info.path, info.mtime_ns, info.size) in _tree_cache
         
-    def _parse_file(self, path, language):
-        """Parse a file and generate AST"""
+    def _parse_file(self, info, language, source_code=None):
+        """Parse a file (given as a FileInfo) and generate AST"""
+        path = info.path
         parser = self.parsers.get(language)
         if not parser:
             self.logger.warning(f"No parser available for {language}")
             return None
             
         try:
-            with open(path, 'rb') as f:
-                source_code = f.read()
-                
+            # Reuse the tree if the file is unchanged since it was last parsed
+            lru_key = None
+            if info.size <= self.lru_max_file_bytes:
+                lru_key = file_cache_key(path, info.mtime_ns, info.size)
+                tree = _tree_cache.get(lru_key)
+                if tree is not None:
+                    return tree
+                    
+            if source_code is None:
+                with open(path, 'rb') as f:
+                    source_code = f.read()
+                    
             # Parse the source code
             tree = parser.parse(source_code)
             
+            if lru_key:
+                _tree_cache.put(lru_key, tree)
+                
             # Return the syntax tree
             return tree
             
@@ -178,4 +270,54 @@ class SyntaxParser:
         except Exception as e:
             self.logger.error(f"Error parsing code snippet: {e}")
             return None
+            
+    def parse_and_query(self, source, language, query):
+        """
+        Parse source code and run a tree-sitter query over the tree
+        
+        Args:
+            source (bytes): Source code
+            language (str): Programming language
+            query (str): Query in tree-sitter S-expression syntax, compiled on first use
+            
+        Returns:
+            tuple: (tree, captures) where captures is a list of (capture name, node)
+                in document order, or None if no grammar is loaded for the language
+        """
+        compiled = self._compile_query(language, query)
+        if compiled is None:
+            return None
+            
+        tree = self.parsers[language].parse(source)
+        return tree, _run_query(compiled, tree.root_node)
+        
+    def _compile_query(self, language, query):
+        """Compile a query once per language and query string"""
+        key = (language, query)
+        compiled = self._queries.get(key)
+        
+        if compiled is None and language in self.languages:
+            if QueryCursor is not None:
+                compiled = Query(self.languages[language], query)
+            else:
+                compiled = self.languages[language].query(query)
+            self._queries[key] = compiled
+            
+        return compiled
+
 
+def _run_query(query, node):
+    """Run a compiled query, returning (capture name, node) pairs in document order"""
+    if QueryCursor is not None:
+        captures = QueryCursor(query).captures(node)
+    else:
+        captures = query.captures(node)
+        
+    # Depending on the binding version captures are a {name: [nodes]} dict or (node, name) pairs
+    if isinstance(captures, dict):
+        pairs = [(name, captured) for name, nodes in captures.items() for captured in nodes]
+    else:
+        pairs = [(name, captured) for captured, name in captures]
+        
+    pairs.sort(key=lambda pair: pair[1].start_byte)
+    return pairs
@@ -0,0 +1,72 @@
+# CodingAssistant/context_management/bm25_index.py
+import heapq
+import math
+import re
+from collections import Counter
+
+# Identifier pieces: "parseHTTPResponse_v2" -> parse, HTTP, Response, v2
+_TOKEN_PATTERN = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+
+def tokenize(text):
+    """
+    Split text into lowercase terms, breaking up camelCase, snake_case and paths
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        list: Terms
+    """
+    return [token.lower() for token in _TOKEN_PATTERN.findall(text)]
+
+
+class BM25Index:
+    """
+    Okapi BM25 ranking over a fixed set of tokenized documents
+
+    Postings are precomputed per term, so a query only scores the documents
+    that contain at least one of its terms.
+    """
+    def __init__(self, documents, k1=1.5, b=0.75):
+        """
+        Build the index
+
+        Args:
+            documents (list): One list of terms per document
+            k1 (float, optional): Term frequency saturation
+            b (float, optional): Document length normalization
+        """
+        self.postings = {}
+        doc_count = len(documents)
+        avg_length = sum(len(doc) for doc in documents) / doc_count if doc_count else 0
+
+        for doc_id, doc in enumerate(documents):
+            if not doc:
+                continue
+            norm = k1 * (1 - b + b * len(doc) / avg_length)
+            for term, freq in Counter(doc).items():
+                # Term frequency part of the score; idf is applied once postings are complete
+                self.postings.setdefault(term, []).append((doc_id, freq * (k1 + 1) / (freq + norm)))
+
+        for term, postings in self.postings.items():
+            df = len(postings)
+            idf = math.log((doc_count - df + 0.5) / (df + 0.5) + 1)
+            self.postings[term] = [(doc_id, weight * idf) for doc_id, weight in postings]
+
+    def top_n(self, terms, n=10):
+        """
+        Rank documents against query terms
+
+        Args:
+            terms (list): Query terms
+            n (int, optional): Maximum number of results
+
+        Returns:
+            list: (document index, score) pairs, best first
+        """
+        scores = Counter()
+        for term in set(terms):
+            for doc_id, weight in self.postings.get(term, ()):
+                scores[doc_id] += weight
+
+        return heapq.nlargest(n, scores.items(), key=lambda item: item[1])
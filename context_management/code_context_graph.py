@@ -1,10 +1,32 @@
 # CodingAssistant/context_management/code_context_graph.py
 import logging
-import json
 import os
+import pickle
+import sys
+import warnings
 from pathlib import Path
 import networkx as nx
 
+try:
+    import igraph
+except ImportError:
+    igraph = None
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+from context_management.bm25_index import BM25Index, tokenize
+from utils.fs import walk_repo, skip_dirs_from_config, relative_path
+from utils import json_utils
+
+# Labels repeated on every node/edge, interned so they share a single object
+REL_CONTAINS = sys.intern('contains')
+REL_DEFINES = sys.intern('defines')
+NODE_FILE = sys.intern('file')
+NODE_DIRECTORY = sys.intern('directory')
+
 class CodeContextGraph:
     """
     Builds and manages a graph representation of code relationships
@@ -13,15 +35,21 @@ class CodeContextGraph:
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.graph = nx.DiGraph()
+        self._compiled = None
+        self._bm25 = None
+        self._bm25_nodes = []
+        self.use_igraph = igraph is not None and config.get('use_igraph', True)
         self.storage_dir = Path(config.get('storage_dir', 'graphs'))
         os.makedirs(self.storage_dir, exist_ok=True)
+        self.skip_dirs = skip_dirs_from_config(config)
         
-    def build_graph(self, repo_path):
+    def build_graph(self, repo_path, files=None):
         """
         Build a code context graph for a repository
         
         Args:
             repo_path (str): Path to the repository
+            files (list, optional): FileInfo list from walk_repo, to share one traversal
             
         Returns:
             bool: Success
@@ -33,12 +61,14 @@ class CodeContextGraph:
             
             # Clear existing graph
             self.graph = nx.DiGraph()
+            self._compiled = None
+            self._bm25 = None
             
             # Add repository node
             self.graph.add_node(str(repo_path), type='repository', path=str(repo_path))
             
             # Add file nodes
-            self._add_file_nodes(repo_path)
+            self._add_file_nodes(repo_path, files if files is not None else walk_repo(repo_path, self.skip_dirs))
             
             # Add code entity nodes (classes, functions, etc.)
             self._add_code_entities(repo_path)
@@ -46,6 +76,13 @@ class CodeContextGraph:
             # Add relationships
             self._add_code_relationships(repo_path)
             
+            # Structure changed; recompile lazily on the next traversal
+            self._compiled = None
+            
+            # Index node names and attributes for relevance queries
+            self._bm25 = None
+            self._relevance_index()
+            
             # Save graph
             self._save_graph(repo_path.name)
             
@@ -56,42 +93,50 @@ class CodeContextGraph:
             self.logger.error(f"Error building code context graph: {e}")
             return False
             
-    def _add_file_nodes(self, repo_path):
+    def _add_file_nodes(self, repo_path, files):
         """Add file nodes to the graph"""
-        for path in repo_path.rglob('*'):
-            if path.is_file() and '.git' not in str(path):
-                relative_path = path.relative_to(repo_path)
+        # Each path string is used as node ID, attribute and edge endpoint; share one object
+        repo_str = sys.intern(str(repo_path))
+        prefix = os.path.join(repo_str, '')
+        seen_dirs = set()
+        
+        for info in files:
+            rel_str = sys.intern(relative_path(info.path, prefix))
+            self.graph.add_node(
+                rel_str,
+                type=NODE_FILE,
+                path=rel_str,
+                extension=sys.intern(info.path.suffix),
+                size=info.size
+            )
+            
+            # Add edge from repository to file
+            self.graph.add_edge(repo_str, rel_str, relationship=REL_CONTAINS)
+            
+            # Add directory nodes, stopping at the first ancestor already added
+            dir_str = os.path.dirname(rel_str)
+            if dir_str:
+                # Only the immediate parent directory contains the file
+                self.graph.add_edge(sys.intern(dir_str), rel_str, relationship=REL_CONTAINS)
+            
+            while dir_str:
+                dir_str = sys.intern(dir_str)
+                if dir_str in seen_dirs:
+                    break
+                seen_dirs.add(dir_str)
+                
                 self.graph.add_node(
-                    str(relative_path),
-                    type='file',
-                    path=str(relative_path),
-                    extension=path.suffix,
-                    size=path.stat().st_size
+                    dir_str,
+                    type=NODE_DIRECTORY,
+                    path=dir_str
                 )
                 
-                # Add edge from repository to file
-                self.graph.add_edge(str(repo_path), str(relative_path), relationship='contains')
+                # Add edge from repository to directory
+                self.graph.add_edge(repo_str, dir_str, relationship=REL_CONTAINS)
+                
+                # Move up one level
+                dir_str = os.path.dirname(dir_str)
                 
-                # Add directory hierarchy
-                parent_dir = relative_path.parent
-                while parent_dir != Path('.'):
-                    # Add directory node if it doesn't exist
-                    if str(parent_dir) not in self.graph:
-                        self.graph.add_node(
-                            str(parent_dir),
-                            type='directory',
-                            path=str(parent_dir)
-                        )
-                        
-                        # Add edge from repository to directory
-                        self.graph.add_edge(str(repo_path), str(parent_dir), relationship='contains')
-                        
-                    # Add edge from directory to file
-                    self.graph.add_edge(str(parent_dir), str(relative_path), relationship='contains')
-                    
-                    # Move up one level
-                    parent_dir = parent_dir.parent
-                    
     def _add_code_entities(self, repo_path):
         """Add code entity nodes to the graph"""
         # This would typically use language-specific parsers to extract entities
@@ -112,7 +157,7 @@ class CodeContextGraph:
         )
         
         # Connect to file
-        self.graph.add_edge('example/file.py', 'ExampleClass', relationship='contains')
+        self.graph.add_edge('example/file.py', 'ExampleClass', relationship=REL_CONTAINS)
         
     def _add_code_relationships(self, repo_path):
         """Add relationships between code entities"""
@@ -123,7 +168,7 @@ class CodeContextGraph:
         self.graph.add_edge(
             'ExampleClass',
             'method1',
-            relationship='defines'
+            relationship=REL_DEFINES
         )
         
     def get_relevant_nodes(self, query, max_nodes=10):
@@ -131,29 +176,41 @@ class CodeContextGraph:
         Get nodes relevant to a query
         
         Args:
-            query (str): User query
+            query (str): User query, or a processed query dict with 'raw_query'
             max_nodes (int, optional): Maximum number of nodes to return
             
         Returns:
-            list: Relevant nodes
+            list: (node, data) pairs ranked by BM25 score, best first
         """
-        # In a real implementation, we would:
-        # 1. Parse the query to identify mentioned code entities
-        # 2. Find those entities in the graph
-        # 3. Get neighboring nodes that are relevant to the query
-        # 4. Return the subgraph
-        
-        # For demonstration, return a few random nodes
-        import random
-        
+        if isinstance(query, dict):
+            query = query.get('raw_query') or ''
+            
         if len(self.graph) == 0:
             return []
             
-        nodes = list(self.graph.nodes(data=True))
-        if len(nodes) > max_nodes:
-            nodes = random.sample(nodes, max_nodes)
+        index = self._relevance_index()
+        return [
+            (self._bm25_nodes[doc_id], self.graph.nodes[self._bm25_nodes[doc_id]])
+            for doc_id, _ in index.top_n(tokenize(str(query)), max_nodes)
+        ]
+        
+    def _relevance_index(self):
+        """
+        Get the BM25 index over node names and string attributes, building it on first use
+        
+        Returns:
+            BM25Index: Index whose document IDs are positions in self._bm25_nodes
+        """
+        if self._bm25 is None:
+            self._bm25_nodes = list(self.graph.nodes)
+            documents = []
+            for node, data in self.graph.nodes(data=True):
+                text = {str(node)}
+                text.update(value for value in data.values() if isinstance(value, str))
+                documents.append(tokenize(' '.join(text)))
+            self._bm25 = BM25Index(documents)
             
-        return nodes
+        return self._bm25
         
     def find_path(self, source, target):
         """
@@ -168,7 +225,11 @@ class CodeContextGraph:
         """
         try:
             if source in self.graph and target in self.graph:
-                path = nx.shortest_path(self.graph, source, target)
+                compiled = self._compiled_graph()
+                if compiled:
+                    path = self._compiled_shortest_path(compiled, source, target)
+                else:
+                    path = nx.shortest_path(self.graph, source, target)
                 return [{'node': node, 'data': self.graph.nodes[node]} for node in path]
             else:
                 return []
@@ -178,6 +239,45 @@ class CodeContextGraph:
             self.logger.error(f"Error finding path: {e}")
             return []
             
+    def _compiled_graph(self):
+        """
+        Get an igraph copy of the graph structure for C-level traversals
+        
+        networkx remains the source of truth for node and edge attributes;
+        the compiled copy holds only topology plus a name <-> vertex index map.
+        
+        Returns:
+            tuple: (igraph.Graph, name -> index dict, index -> name list), or None
+        """
+        if not self.use_igraph:
+            return None
+            
+        if self._compiled is None:
+            names = list(self.graph.nodes)
+            index = {name: i for i, name in enumerate(names)}
+            compiled = igraph.Graph(
+                n=len(names),
+                edges=[(index[u], index[v]) for u, v in self.graph.edges],
+                directed=True
+            )
+            self._compiled = (compiled, index, names)
+            
+        return self._compiled
+        
+    def _compiled_shortest_path(self, compiled, source, target):
+        """Shortest path over the igraph copy, raising NetworkXNoPath like networkx"""
+        graph, index, names = compiled
+        
+        with warnings.catch_warnings():
+            # igraph warns instead of raising when the target is unreachable
+            warnings.simplefilter('ignore', RuntimeWarning)
+            vpath = graph.get_shortest_paths(index[source], to=index[target], output='vpath')[0]
+            
+        if not vpath:
+            raise nx.NetworkXNoPath(f"No path between {source} and {target}.")
+            
+        return [names[i] for i in vpath]
+        
     def find_dependencies(self, entity):
         """
         Find dependencies of a code entity
@@ -214,17 +314,36 @@ class CodeContextGraph:
             
         return dependencies
         
+    def _graph_paths(self, repo_name):
+        """Candidate graph files for a repository, preferred format first"""
+        binary = [self.storage_dir / f"{repo_name}_graph.pkl"]
+        if zstd is not None:
+            binary.insert(0, self.storage_dir / f"{repo_name}_graph.pkl.zst")
+        json_path = self.storage_dir / f"{repo_name}_graph.json"
+        
+        if self.config.get('graph_format', 'pickle') == 'json':
+            return [json_path] + binary
+        return binary + [json_path]
+        
     def _save_graph(self, repo_name):
         """Save graph to disk"""
         try:
-            graph_path = self.storage_dir / f"{repo_name}_graph.json"
+            graph_path = self._graph_paths(repo_name)[0]
             
-            # Convert NetworkX graph to JSON
+            # Convert NetworkX graph to a plain dict structure
             data = nx.node_link_data(self.graph)
             
-            with open(graph_path, 'w') as f:
-                json.dump(data, f, indent=2)
-                
+            if graph_path.suffix == '.json':
+                # Human-readable format, for debugging
+                with open(graph_path, 'wb') as f:
+                    f.write(json_utils.dumps(data, indent=True))
+            elif graph_path.suffix == '.zst':
+                with open(graph_path, 'wb') as f, zstd.ZstdCompressor(level=3).stream_writer(f) as writer:
+                    pickle.dump(data, writer, protocol=pickle.HIGHEST_PROTOCOL)
+            else:
+                with open(graph_path, 'wb') as f:
+                    pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    
             return True
             
         except Exception as e:
@@ -242,16 +361,25 @@ class CodeContextGraph:
             bool: Success
         """
         try:
-            graph_path = self.storage_dir / f"{repo_name}_graph.json"
+            graph_path = next((path for path in self._graph_paths(repo_name) if path.exists()), None)
             
-            if not graph_path.exists():
+            if graph_path is None:
                 self.logger.warning(f"Graph for {repo_name} not found")
                 return False
                 
-            with open(graph_path, 'r') as f:
-                data = json.load(f)
-                
+            if graph_path.suffix == '.json':
+                with open(graph_path, 'rb') as f:
+                    data = json_utils.loads(f.read())
+            elif graph_path.suffix == '.zst':
+                with open(graph_path, 'rb') as f, zstd.ZstdDecompressor().stream_reader(f) as reader:
+                    data = pickle.load(reader)
+            else:
+                with open(graph_path, 'rb') as f:
+                    data = pickle.load(f)
+                    
             self.graph = nx.node_link_graph(data)
+            self._compiled = None
+            self._bm25 = None
             
             self.logger.info(f"Loaded graph with {self.graph.number_of_nodes()} nodes and {self.graph.number_of_edges()} edges")
             return True
@@ -259,4 +387,3 @@ class CodeContextGraph:
         except Exception as e:
             self.logger.error(f"Error loading graph: {e}")
             return False
-
@@ -0,0 +1,81 @@
+# CodingAssistant/context_management/records.py
+from typing import NamedTuple, Optional
+
+class Interaction(NamedTuple):
+    """One query/response turn"""
+    timestamp: str
+    query: str
+    response: str
+    metadata: dict
+    kind = 'interaction'
+
+
+class ActiveFile(NamedTuple):
+    """A file the session is working with"""
+    path: str
+    added_at: str
+    metadata: dict
+    kind = 'active_file'
+
+
+class Insight(NamedTuple):
+    """A finding recorded during the session"""
+    text: str
+    source: Optional[str]
+    timestamp: str
+    kind = 'insight'
+
+
+class FunctionSummary(NamedTuple):
+    """An analyzed function as kept in the session context"""
+    name: str
+    file: str
+    language: str
+    signature: str
+    # Precomputed so name lookups never lowercase per query
+    name_lower: str
+
+
+# Context list -> record type stored in it
+RECORD_TYPES = {
+    'interactions': Interaction,
+    'conversation_history': Interaction,
+    'active_files': ActiveFile,
+    'insights': Insight
+}
+
+# Event kind -> record type, for replaying logged events
+EVENT_RECORD_TYPES = {record_type.kind: record_type for record_type in RECORD_TYPES.values()}
+
+
+def to_plain(context):
+    """
+    Copy a context with its records converted to dicts, for JSON/msgpack encoders
+
+    Args:
+        context (dict): Context holding record lists
+
+    Returns:
+        dict: Shallow copy with every record list replaced by a list of dicts
+    """
+    plain = dict(context)
+    for key in RECORD_TYPES:
+        if key in plain:
+            plain[key] = [record._asdict() for record in plain[key]]
+    return plain
+
+
+def from_plain(context):
+    """
+    Convert the record lists of a decoded context back to records, in place
+
+    Args:
+        context (dict): Context as produced by `to_plain` and decoded
+
+    Returns:
+        dict: The same context
+    """
+    for key, record_type in RECORD_TYPES.items():
+        if key in context:
+            context[key] = [record_type(**item) for item in context[key]]
+    return context
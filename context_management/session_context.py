@@ -1,14 +1,39 @@
 # CodingAssistant/context_management/session_context.py
+import bisect
+import functools
+import hashlib
 import logging
-import json
 import os
+import sys
+import threading
+import weakref
 from datetime import datetime
 from pathlib import Path
 import uuid
 
+from context_management.records import Interaction, ActiveFile, Insight, FunctionSummary, EVENT_RECORD_TYPES, to_plain, from_plain
+from utils import json_utils
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Queries of dropped interactions kept in the rolling summary
+MAX_SUMMARY_TOPICS = 20
+
 class SessionContextStore:
     """
     Stores and manages conversation context across sessions
+    
+    Each mutation is appended as one JSON line to sessions/{id}.jsonl; the full
+    context is only rewritten to sessions/{id}.msgpack (or .json, per the
+    session_format setting) as a periodic snapshot, after which the log is
+    truncated. Loading replays the log over the snapshot.
+    
+    Lines are buffered and written by a debounced background flush, so a burst
+    of mutations costs one write. Pending lines are also written when the store
+    is garbage collected or the interpreter exits.
     """
     def __init__(self, config):
         self.config = config
@@ -20,10 +45,27 @@ class SessionContextStore:
             'interactions': [],
             'state': {},
             'active_files': [],
-            'insights': []
+            'insights': [],
+            'event_seq': 0
         }
-        self.storage_dir = Path(config.get('storage_dir', 'sessions'))
-        os.makedirs(self.storage_dir, exist_ok=True)
+        self.storage_dir = _ensure_storage_dir(config.get('storage_dir', 'sessions'))
+        self.snapshot_interval = config.get('snapshot_interval', 50)
+        self.flush_delay = config.get('flush_delay', 0.5)
+        self.max_history = config.get('max_history', 200)
+        self.session_format = config.get('session_format', 'msgpack')
+        # Force writes to stable storage; off by default, since losing the last
+        # few turns in a power cut is acceptable for interactive sessions
+        self.fsync_sessions = config.get('fsync_sessions', False)
+        if self.session_format == 'msgpack' and msgpack is None:
+            self.session_format = 'json'
+        self._lock = threading.Lock()
+        self._pending = []
+        self._flush_timer = None
+        self._has_snapshot = False
+        self._snapshot_seq = 0
+        # Path -> position in context['active_files']
+        self._active_file_index = {}
+        self._finalizer = self._register_finalizer()
         
     def update_context(self, query, response, metadata=None):
         """
@@ -38,18 +80,10 @@ class SessionContextStore:
             bool: Success
         """
         try:
-            interaction = {
-                'timestamp': datetime.now().isoformat(),
-                'query': query,
-                'response': response,
-                'metadata': metadata or {}
-            }
+            now = datetime.now().isoformat()
+            interaction = Interaction(now, query, response, metadata or {})
             
-            self.context['interactions'].append(interaction)
-            self.context['updated_at'] = datetime.now().isoformat()
-            
-            # Save context to disk
-            self._save_context()
+            self._record('interaction', interaction, now)
             
             return True
             
@@ -66,7 +100,10 @@ class SessionContextStore:
             max_interactions (int, optional): Maximum number of interactions to include
             
         Returns:
-            dict: Relevant context
+            dict: Relevant context, split into 'static' (changes only when files
+                or state change) and 'dynamic' (changes every turn). Prompts
+                should emit the static part before any per-turn content, so the
+                prompt prefix stays cacheable by the LLM provider
         """
         try:
             # Basic implementation: just return most recent interactions
@@ -78,15 +115,33 @@ class SessionContextStore:
             # 3. Build a more structured context based on the query intent
             
             return {
-                'recent_interactions': recent_interactions,
-                'active_files': self.context['active_files'],
-                'state': self.context['state']
+                'static': self._static_context(),
+                'dynamic': {
+                    'recent_interactions': recent_interactions,
+                    'summary': self.context.get('summary', '')
+                }
             }
             
         except Exception as e:
             self.logger.error(f"Error retrieving relevant context: {e}")
             return {}
             
+    def get_static_prefix_hash(self):
+        """
+        Hash of the static part of the relevant context
+        
+        Returns:
+            str: Hex digest that changes exactly when the static prompt prefix does
+        """
+        static = json_utils.dumps(to_plain(self._static_context()))
+        return hashlib.blake2b(static, digest_size=16).hexdigest()
+        
+    def _static_context(self):
+        return {
+            'active_files': self.context['active_files'],
+            'state': self.context['state']
+        }
+            
     def update_state(self, key, value):
         """
         Update the session state
@@ -99,9 +154,7 @@ class SessionContextStore:
             bool: Success
         """
         try:
-            self.context['state'][key] = value
-            self.context['updated_at'] = datetime.now().isoformat()
-            self._save_context()
+            self._record('state', {key: value}, datetime.now().isoformat())
             return True
         except Exception as e:
             self.logger.error(f"Error updating session state: {e}")
@@ -133,22 +186,10 @@ class SessionContextStore:
             bool: Success
         """
         try:
-            file_info = {
-                'path': file_path,
-                'added_at': datetime.now().isoformat(),
-                'metadata': metadata or {}
-            }
+            now = datetime.now().isoformat()
+            file_info = ActiveFile(file_path, now, metadata or {})
             
-            # Check if file is already in active files
-            for existing in self.context['active_files']:
-                if existing['path'] == file_path:
-                    existing.update(file_info)
-                    break
-            else:
-                self.context['active_files'].append(file_info)
-                
-            self.context['updated_at'] = datetime.now().isoformat()
-            self._save_context()
+            self._record('active_file', file_info, now)
             return True
             
         except Exception as e:
@@ -167,15 +208,10 @@ class SessionContextStore:
             bool: Success
         """
         try:
-            insight_entry = {
-                'text': insight,
-                'source': source,
-                'timestamp': datetime.now().isoformat()
-            }
+            now = datetime.now().isoformat()
+            insight_entry = Insight(insight, source, now)
             
-            self.context['insights'].append(insight_entry)
-            self.context['updated_at'] = datetime.now().isoformat()
-            self._save_context()
+            self._record('insight', insight_entry, now)
             return True
             
         except Exception as e:
@@ -193,37 +229,272 @@ class SessionContextStore:
             bool: Success
         """
         try:
-            session_path = self.storage_dir / f"{session_id}.json"
-            
-            if not session_path.exists():
+            # Prefer our own format, but sessions saved in the other one still load
+            formats = sorted(('msgpack', 'json'), key=lambda fmt: fmt != self.session_format)
+            for session_format in formats:
+                session_path = self.storage_dir / f"{session_id}.{session_format}"
+                if session_path.exists():
+                    break
+            else:
                 self.logger.warning(f"Session {session_id} not found")
                 return False
                 
-            with open(session_path, 'r') as f:
-                self.context = json.load(f)
-                self.session_id = session_id
+            with open(session_path, 'rb') as f:
+                data = f.read()
                 
-            self.logger.info(f"Loaded session {session_id}")
+            if session_format == 'msgpack':
+                if msgpack is None:
+                    self.logger.error(f"Session {session_id} is stored as msgpack, which is not installed")
+                    return False
+                context = msgpack.unpackb(data, raw=False)
+            else:
+                context = json_utils.loads(data)
+            from_plain(context)
+                
+            # Finish writing the current session before switching
+            self.flush()
+            self._finalizer.detach()
+            
+            self.context = context
+            self.context.setdefault('event_seq', 0)
+            self._active_file_index = {
+                info.path: i for i, info in enumerate(self.context['active_files'])
+            }
+            self._has_snapshot = True
+            self._snapshot_seq = self.context['event_seq']
+            self.session_id = session_id
+            self._finalizer = self._register_finalizer()
+            
+            # Replay mutations logged since the snapshot
+            replayed = 0
+            log_path = self.storage_dir / f"{session_id}.jsonl"
+            if log_path.exists():
+                with open(log_path, 'rb') as f:
+                    for line in f:
+                        try:
+                            event = json_utils.loads(line)
+                        except ValueError:
+                            # A torn last line from an interrupted write
+                            break
+                            
+                        # Events already folded into the snapshot
+                        if event['n'] <= self.context['event_seq']:
+                            continue
+                            
+                        payload = event['p']
+                        if event['k'] in EVENT_RECORD_TYPES:
+                            payload = EVENT_RECORD_TYPES[event['k']](**payload)
+                            
+                        self._apply_event(event['k'], payload, event['t'])
+                        self.context['event_seq'] = event['n']
+                        replayed += 1
+                        
+            self.logger.info(f"Loaded session {session_id} ({replayed} logged events replayed)")
             return True
             
         except Exception as e:
             self.logger.error(f"Error loading session {session_id}: {e}")
             return False
             
-    def _save_context(self):
-        """Save context to disk"""
+    def flush(self):
+        """
+        Write buffered events now, snapshotting the full context when due
+        
+        Returns:
+            bool: Success
+        """
         try:
-            session_path = self.storage_dir / f"{self.session_id}.json"
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                    
+                if not self._pending:
+                    return True
+                    
+                log_path = self.storage_dir / f"{self.session_id}.jsonl"
+                if self.context['event_seq'] - self._snapshot_seq >= self.snapshot_interval:
+                    # Everything pending is in the snapshot, so start a fresh log
+                    if self._save_context():
+                        open(log_path, 'wb').close()
+                        self._pending.clear()
+                        self._snapshot_seq = self.context['event_seq']
+                        return True
+                        
+                _write_lines(log_path, self._pending, self.fsync_sessions)
+                return True
+                
+        except Exception as e:
+            self.logger.error(f"Error flushing session events: {e}")
+            return False
             
-            with open(session_path, 'w') as f:
-                json.dump(self.context, f, indent=2)
+    def close(self):
+        """Flush buffered events and stop background writes"""
+        self.flush()
+        self._finalizer.detach()
+        
+    def _record(self, kind, payload, now):
+        """Apply a mutation, stamped with its caller's timestamp, and queue it for the event log"""
+        with self._lock:
+            self._apply_event(kind, payload, now)
+            self.context['event_seq'] += 1
+            
+            if not self._has_snapshot:
+                # The first event of a session writes its baseline snapshot
+                self._has_snapshot = self._snapshot_path().exists()
+                if not self._has_snapshot:
+                    self._has_snapshot = self._save_context()
+                    self._snapshot_seq = self.context['event_seq']
+                    return
+                    
+            if kind in EVENT_RECORD_TYPES:
+                payload = payload._asdict()
+            event = {'n': self.context['event_seq'], 'k': kind, 'p': payload, 't': now}
+            self._pending.append(json_utils.dumps(event) + b'\n')
+            
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
                 
+    def _register_finalizer(self):
+        # Must not reference self, or the store would never be collected
+        log_path = self.storage_dir / f"{self.session_id}.jsonl"
+        return weakref.finalize(self, _flush_pending, log_path, self._pending, self._lock)
+        
+    def _apply_event(self, kind, payload, timestamp):
+        """Apply one logged mutation; shared by live updates and replay"""
+        if kind == 'interaction':
+            self.context['interactions'].append(payload)
+            _cap_history(self.context, 'interactions', self.max_history)
+        elif kind == 'state':
+            self.context['state'].update(payload)
+        elif kind == 'active_file':
+            # Check if file is already in active files
+            index = self._active_file_index.get(payload.path)
+            if index is not None:
+                self.context['active_files'][index] = payload
+            else:
+                self._active_file_index[payload.path] = len(self.context['active_files'])
+                self.context['active_files'].append(payload)
+        elif kind == 'insight':
+            self.context['insights'].append(payload)
+        else:
+            self.logger.warning(f"Ignoring unknown session event: {kind}")
+            return
+            
+        self.context['updated_at'] = timestamp
+        
+    def export_json(self, path=None):
+        """
+        Write the full context as indented JSON for inspection
+        
+        Args:
+            path (str, optional): Output path, default sessions/{id}.export.json
+            
+        Returns:
+            Path: Written file, or None on error
+        """
+        try:
+            path = Path(path) if path else self.storage_dir / f"{self.session_id}.export.json"
+            with self._lock:
+                data = json_utils.dumps(to_plain(self.context), indent=True)
+                
+            with open(path, 'wb') as f:
+                f.write(data)
+                
+            return path
+            
+        except Exception as e:
+            self.logger.error(f"Error exporting session {self.session_id}: {e}")
+            return None
+            
+    def _snapshot_path(self):
+        return self.storage_dir / f"{self.session_id}.{self.session_format}"
+        
+    def _save_context(self):
+        """Save context to disk"""
+        session_path = self._snapshot_path()
+        tmp_path = session_path.with_name(f"{session_path.name}.{os.getpid()}.tmp")
+        
+        try:
+            if self.session_format == 'msgpack':
+                data = msgpack.packb(to_plain(self.context), use_bin_type=True)
+            else:
+                data = json_utils.dumps(to_plain(self.context))
+            
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+                if self.fsync_sessions:
+                    _fdatasync(f)
+                    
+            # Atomic so a crash mid-write never leaves a truncated snapshot
+            os.replace(tmp_path, session_path)
             return True
             
         except Exception as e:
             self.logger.error(f"Error saving context: {e}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
             return False
 
+@functools.lru_cache(maxsize=16)
+def _ensure_storage_dir(storage_dir):
+    """Create a session directory once per process, not once per store"""
+    path = Path(storage_dir)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _cap_history(context, key, max_history):
+    """
+    Drop the oldest interactions beyond max_history, folding their queries into a summary
+    
+    Args:
+        context (dict): Context holding the interaction list
+        key (str): Key of the interaction list
+        max_history (int): Number of interactions to keep
+    """
+    history = context[key]
+    excess = len(history) - max_history
+    if excess <= 0:
+        return
+        
+    topics = context.setdefault('earlier_topics', [])
+    for interaction in history[:excess]:
+        # First line of the query, shortened, is enough to recall the topic
+        topic = str(interaction.query).strip().split('\n', 1)[0]
+        topics.append(topic[:80])
+    del history[:excess]
+    del topics[:-MAX_SUMMARY_TOPICS]
+    
+    context['summary'] = "Previously discussed: " + "; ".join(topics)
+
+
+def _write_lines(log_path, lines, sync=False):
+    """Append encoded event lines to a session log and clear them"""
+    with open(log_path, 'ab') as f:
+        f.write(b''.join(lines))
+        if sync:
+            _fdatasync(f)
+    lines.clear()
+
+
+def _fdatasync(f):
+    """Flush a file's data to disk; fdatasync skips the metadata fsync also writes"""
+    f.flush()
+    getattr(os, 'fdatasync', os.fsync)(f.fileno())
+
+
+def _flush_pending(log_path, lines, lock):
+    """Finalizer for SessionContextStore: write whatever is still buffered"""
+    with lock:
+        if lines:
+            _write_lines(log_path, lines)
+
+
 ### Enhanced Context Management
 ### This module provides an enhanced context management system for handling
 ### conversations, code analysis, and insights in a structured manner. It allows for  
@@ -245,13 +516,22 @@ class EnhancedContextManager:
             'code_explanations': {},
             'insights': []
         }
+        self.max_history = config.get('max_history', 200)
+        # Bumped whenever code sources, analyses or insights change
+        self.version = 0
+        # Suffix index over analyzed function names, rebuilt when analyses change
+        self._name_index = None
+        # Lowercased insight texts, parallel to context['insights']
+        self._insight_texts = []
+        # (version, functions, classes) flattened across analyses
+        self._flat_cache = None
         
     def add_code_source(self, source_data):
         """Add a code source to the context"""
-        source_id = str(uuid.uuid4())
+        source_id = sys.intern(str(uuid.uuid4()))
         source_summary = {
             'id': source_id,
-            'type': source_data['source_type'],
+            'type': sys.intern(source_data['source_type']),
             'path': source_data['path'],
             'file_count': len(source_data['files']),
             'added_at': datetime.now().isoformat()
@@ -264,7 +544,8 @@ class EnhancedContextManager:
         for file in source_data['files']:
             files_summary.append({
                 'path': file['path'],
-                'language': file['language'],
+                # Few distinct values repeated per file; share one string each
+                'language': sys.intern(file['language']),
                 'size': file['size']
             })
             
@@ -272,6 +553,7 @@ class EnhancedContextManager:
             'files': files_summary,
             'analyzed': False
         }
+        self.version += 1
         
         return source_id
         
@@ -291,14 +573,17 @@ class EnhancedContextManager:
         # Store function and class summaries
         function_summaries = []
         for func in analysis_results['functions']:
-            function_summaries.append({
-                'name': func['name'],
-                'file': func['file'],
-                'language': func['language'],
-                'signature': func.get('signature', '')
-            })
+            function_summaries.append(FunctionSummary(
+                func['name'],
+                sys.intern(func['file']),
+                sys.intern(func['language']),
+                func.get('signature', ''),
+                func['name'].lower()
+            ))
             
         self.context['analyses'][source_id]['functions'] = function_summaries
+        self._name_index = None
+        self.version += 1
         
         # Add insights
         for insight in analysis_results.get('insights', []):
@@ -308,14 +593,10 @@ class EnhancedContextManager:
         
     def add_conversation_interaction(self, query, response, metadata=None):
         """Add a conversation interaction to the context"""
-        interaction = {
-            'timestamp': datetime.now().isoformat(),
-            'query': query,
-            'response': response,
-            'metadata': metadata or {}
-        }
+        interaction = Interaction(datetime.now().isoformat(), query, response, metadata or {})
         
         self.context['conversation_history'].append(interaction)
+        _cap_history(self.context, 'conversation_history', self.max_history)
         return True
         
     def add_code_explanation(self, code_id, explanation):
@@ -328,13 +609,11 @@ class EnhancedContextManager:
         
     def add_insight(self, insight, source=None):
         """Add an insight to the context"""
-        insight_entry = {
-            'text': insight,
-            'source': source,
-            'timestamp': datetime.now().isoformat()
-        }
+        insight_entry = Insight(insight, source, datetime.now().isoformat())
         
         self.context['insights'].append(insight_entry)
+        self._insight_texts.append(insight.lower())
+        self.version += 1
         return True
         
     def get_relevant_context(self, query, code_entities=None):
@@ -349,28 +628,82 @@ class EnhancedContextManager:
         relevant_classes = []
         
         if code_entities:
+            suffixes, postings, functions = self._function_name_index()
+            
             for entity in code_entities:
-                for source_id, analysis in self.context['analyses'].items():
-                    if not analysis.get('analyzed', False):
-                        continue
-                        
-                    # Look for matching functions
-                    for func in analysis.get('functions', []):
-                        if entity.lower() in func['name'].lower():
-                            relevant_functions.append(func)
-                            
-                    # Look for matching classes (if we had stored them)
-                    # Similar approach would apply
+                # Names containing the entity are those with a suffix starting with it
+                entity = entity.lower()
+                matches = set()
+                i = bisect.bisect_left(suffixes, entity)
+                while i < len(suffixes) and suffixes[i].startswith(entity):
+                    matches.update(postings[suffixes[i]])
+                    i += 1
+                    
+                relevant_functions.extend(functions[position] for position in sorted(matches))
+                
+                # Look for matching classes (if we had stored them)
+                # Similar approach would apply
+        
+        all_functions, all_classes = self._flat_entities()
         
         # Include relevant insights
-        relevant_insights = []
-        for insight in self.context['insights']:
-            if any(term in insight['text'].lower() for term in query.lower().split()):
-                relevant_insights.append(insight)
+        terms = set(query.lower().split())
+        relevant_insights = [
+            insight for insight, text in zip(self.context['insights'], self._insight_texts)
+            if any(term in text for term in terms)
+        ]
         
         return {
             'recent_history': recent_history,
+            'summary': self.context.get('summary', ''),
             'functions': relevant_functions,
             'classes': relevant_classes,
-            'insights': relevant_insights
-        }
\ No newline at end of file
+            'insights': relevant_insights,
+            # Every analyzed function and class, flat, for lookups by name
+            '_all_functions': all_functions,
+            '_all_classes': all_classes
+        }
+        
+    def _flat_entities(self):
+        """
+        Flatten functions and classes across all analyses
+        
+        The same lists are returned until the version changes, so callers can
+        cache whatever they derive from them by identity.
+        
+        Returns:
+            tuple: (functions, classes)
+        """
+        if self._flat_cache is None or self._flat_cache[0] != self.version:
+            functions = []
+            classes = []
+            for analysis in self.context['analyses'].values():
+                functions.extend(analysis.get('functions', []))
+                classes.extend(analysis.get('classes', []))
+            self._flat_cache = (self.version, functions, classes)
+            
+        return self._flat_cache[1], self._flat_cache[2]
+        
+    def _function_name_index(self):
+        """
+        Build (or reuse) the substring index over analyzed function names
+        
+        Returns:
+            tuple: (sorted name suffixes, suffix -> function positions, functions in analysis order)
+        """
+        if self._name_index is None:
+            postings = {}
+            functions = []
+            for analysis in self.context['analyses'].values():
+                if not analysis.get('analyzed', False):
+                    continue
+                    
+                for func in analysis.get('functions', []):
+                    name = func.name_lower
+                    for start in range(len(name) + 1):
+                        postings.setdefault(name[start:], []).append(len(functions))
+                    functions.append(func)
+                    
+            self._name_index = (sorted(postings), postings, functions)
+            
+        return self._name_index
\ No newline at end of file
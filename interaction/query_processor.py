@@ -3,6 +3,9 @@ import logging
 import re
 from enum import Enum
 
+from utils.cache_utils import LRUCache
+from utils.pattern_set import PatternSet
+
 class QueryType(Enum):
     REPOSITORY = 'repository'
     DEBUGGING = 'debugging'
@@ -11,6 +14,60 @@ class QueryType(Enum):
     EXPLANATION = 'explanation'
     GENERAL = 'general'
 
+# Patterns are compiled once at import rather than looked up on every query
+
+# Checked in priority order. Kept as separate searches on purpose: fusing them
+# into one named-group alternation is 2-5x slower under the backtracking re
+# engine, and a leftmost match would not respect the priority order
+_QUERY_TYPE_PATTERNS = [
+    (re.compile(r'(repository|repo|git|clone|upload|download)'), QueryType.REPOSITORY.value),
+    (re.compile(r'(debug|error|fix|issue|problem|not working|fails|exception)'), QueryType.DEBUGGING.value),
+    (re.compile(r'(review|improve|better|optimize|refactor)'), QueryType.CODE_REVIEW.value),
+    (re.compile(r'(suggestion|recommend|suggest|how to implement|how to write)'), QueryType.CODE_SUGGESTION.value),
+    (re.compile(r'(explain|what does|how does|what is|mean)'), QueryType.EXPLANATION.value)
+]
+
+# Entity patterns stay separate searches: matches overlap on purpose ("Foo()" is
+# both a class and a function mention) and results are grouped by kind, neither
+# of which a single fused finditer pass can reproduce. Fusing was not faster either
+_FILE_PATH_RE = re.compile(r'(\b[\/\\]?[a-zA-Z0-9_-]+[\/\\][a-zA-Z0-9_\-\.\/\\]+\b)')
+_CLASS_NAME_RE = re.compile(r'\b([A-Z][a-zA-Z0-9]*)\b')
+_FUNCTION_NAME_RE = re.compile(r'\b([a-zA-Z0-9_]+)\(\)')
+_VARIABLE_NAME_RE = re.compile(r'\b(var|let|const|self\.|this\.)\s+([a-zA-Z0-9_]+)\b')
+
+_CODE_BLOCK_RE = re.compile(r'```(?:\w+)?\s*([\s\S]*?)\s*```')
+_INLINE_CODE_RE = re.compile(r'`([^`]+)`')
+
+_LANGUAGE_PATTERNS = {
+    'python': re.compile(r'\b(python|py)\b'),
+    'javascript': re.compile(r'\b(javascript|js)\b'),
+    'typescript': re.compile(r'\b(typescript|ts)\b'),
+    'java': re.compile(r'\b(java)\b'),
+    'c#': re.compile(r'\b(c#|csharp|c-sharp)\b'),
+    'c++': re.compile(r'\b(c\+\+|cpp)\b'),
+    'go': re.compile(r'\b(go|golang)\b'),
+    'rust': re.compile(r'\b(rust)\b'),
+    'php': re.compile(r'\b(php)\b'),
+    'ruby': re.compile(r'\b(ruby|rb)\b')
+}
+_CODE_BLOCK_LANG_RE = re.compile(r'```(\w+)')
+_LANGUAGE_NAMES = list(_LANGUAGE_PATTERNS)
+
+# All mention patterns in one scan; compiled on first use, not at import
+_LANGUAGE_PATTERN_SET = PatternSet(_LANGUAGE_PATTERNS.values())
+
+# Language hints inside code snippets
+_PYTHON_CODE_RE = re.compile(r'def\s+\w+\s*\(.*\):|\bimport\s+\w+|from\s+\w+\s+import')
+_JS_CODE_RE = re.compile(r'function\s+\w+\s*\(.*\)|const|let|var|=>|import\s+.*\s+from')
+_TYPE_ANNOTATION_RE = re.compile(r':\s*(\w+)\b')
+_JAVA_CODE_RE = re.compile(r'public\s+class|private|protected|System\.out\.println')
+_CSHARP_CODE_RE = re.compile(r'namespace|using\s+\w+;|Console\.WriteLine')
+
+_ERROR_MESSAGE_RE = re.compile(r'Error: (.*?)(?:\n|$)')
+
+# Analysis results by raw query text; users often repeat a query verbatim
+_query_cache = LRUCache(maxsize=1024)
+
 class QueryProcessor:
     """
     Processes and categorizes user queries
@@ -18,6 +75,7 @@ class QueryProcessor:
     def __init__(self, config):
         self.config = config
         self.logger = logging.getLogger(__name__)
+        _query_cache.resize(config.get('query_cache_size', 1024))
         
     def process(self, query):
         """
@@ -29,40 +87,29 @@ class QueryProcessor:
         Returns:
             dict: Processed query information
         """
-        # Fix for the logging issue - safely convert query to string and truncate
-        query_str = str(query) if query is not None else ""
-        log_preview = query_str[:50] + "..." if len(query_str) > 50 else query_str
-        self.logger.info(f"Processing query: {log_preview}")
+        # Ensure query is a string
+        query = str(query) if query is not None else ""
         
-        try:
-             # Safely log without any slicing operations
-            self.logger.info(f"Processing query (length: {len(str(query) if query is not None else '')})")
+        # Preview is only built when it will actually be logged
+        if self.logger.isEnabledFor(logging.INFO):
+            log_preview = query[:50] + "..." if len(query) > 50 else query
+            self.logger.info("Processing query (length: %d): %s", len(query), log_preview)
             
-            # Ensure query is a string
-            if not isinstance(query, str):
-                query = str(query) if query is not None else ""
+        try:
+            analysis = _query_cache.get(query)
+            if analysis is None:
+                analysis = self._analyze(query)
+                _query_cache.put(query, analysis)
                 
-            # Determine query type
-            query_type = self._determine_query_type(query)
-            
-            # Extract mentioned entities
-            entities = self._extract_entities(query)
-            
-            # Extract code snippets
-            code_snippets = self._extract_code_snippets(query)
-            
-            # Determine language if applicable
-            language = self._determine_language(query, code_snippets)
-            
-            # Process query based on type
-            processed_query = self._process_by_type(query, query_type)
+            query_type, processed_query, entities, code_snippets, language = analysis
             
+            # Copies, so callers mutating the result cannot corrupt the cache
             return {
                 'raw_query': query,
                 'processed_query': processed_query,
                 'type': query_type,
-                'entities': entities,
-                'code_snippets': code_snippets,
+                'entities': [dict(entity) for entity in entities],
+                'code_snippets': [dict(snippet) for snippet in code_snippets],
                 'language': language
             }
         
@@ -74,26 +121,46 @@ class QueryProcessor:
                 'error': str(e)
             }
               
+    def clear_cache(self):
+        """Forget cached query analyses"""
+        _query_cache.clear()
+        
+    def _analyze(self, query):
+        """
+        Run the full analysis of a query string
+        
+        Args:
+            query (str): User query
+            
+        Returns:
+            tuple: (query type, processed query, entities, code snippets, language)
+        """
+        # Determine query type
+        query_type = self._determine_query_type(query)
+        
+        # Extract mentioned entities
+        entities = self._extract_entities(query)
+        
+        # Extract code snippets
+        code_snippets = self._extract_code_snippets(query)
+        
+        # Determine language if applicable
+        language = self._determine_language(query, code_snippets)
+        
+        # Process query based on type
+        processed_query = self._process_by_type(query, query_type)
+        
+        return query_type, processed_query, entities, code_snippets, language
+        
     def _determine_query_type(self, query):
         """Determine the type of query"""
         self.logger.info(f"Processing query: \"Determining the type of query\"")
         query_lower = query.lower()
         
-        if re.search(r'(repository|repo|git|clone|upload|download)', query_lower):
-            return QueryType.REPOSITORY.value
-            
-        if re.search(r'(debug|error|fix|issue|problem|not working|fails|exception)', query_lower):
-            return QueryType.DEBUGGING.value
-            
-        if re.search(r'(review|improve|better|optimize|refactor)', query_lower):
-            return QueryType.CODE_REVIEW.value
-            
-        if re.search(r'(suggestion|recommend|suggest|how to implement|how to write)', query_lower):
-            return QueryType.CODE_SUGGESTION.value
-            
-        if re.search(r'(explain|what does|how does|what is|mean)', query_lower):
-            return QueryType.EXPLANATION.value
-            
+        for pattern, query_type in _QUERY_TYPE_PATTERNS:
+            if pattern.search(query_lower):
+                return query_type
+                
         return QueryType.GENERAL.value
         
     def _extract_entities(self, query):
@@ -101,22 +168,22 @@ class QueryProcessor:
         entities = []
         
         # Extract file paths
-        file_paths = re.findall(r'(\b[\/\\]?[a-zA-Z0-9_-]+[\/\\][a-zA-Z0-9_\-\.\/\\]+\b)', query)
+        file_paths = _FILE_PATH_RE.findall(query)
         for path in file_paths:
             entities.append({'type': 'file_path', 'value': path})
             
         # Extract class names (CamelCase)
-        class_names = re.findall(r'\b([A-Z][a-zA-Z0-9]*)\b', query)
+        class_names = _CLASS_NAME_RE.findall(query)
         for class_name in class_names:
             entities.append({'type': 'class', 'value': class_name})
             
         # Extract function/method names
-        function_names = re.findall(r'\b([a-zA-Z0-9_]+)\(\)', query)
+        function_names = _FUNCTION_NAME_RE.findall(query)
         for function_name in function_names:
             entities.append({'type': 'function', 'value': function_name})
             
         # Extract variables (some heuristics)
-        variable_names = re.findall(r'\b(var|let|const|self\.|this\.)\s+([a-zA-Z0-9_]+)\b', query)
+        variable_names = _VARIABLE_NAME_RE.findall(query)
         for _, variable_name in variable_names:
             entities.append({'type': 'variable', 'value': variable_name})
             
@@ -127,7 +194,7 @@ class QueryProcessor:
         snippets = []
         
         # Extract code blocks with backticks
-        code_blocks = re.findall(r'```(?:\w+)?\s*([\s\S]*?)\s*```', query)
+        code_blocks = _CODE_BLOCK_RE.findall(query)
         for i, block in enumerate(code_blocks):
             snippets.append({
                 'id': f'snippet_{i+1}',
@@ -136,7 +203,7 @@ class QueryProcessor:
             })
             
         # Extract inline code
-        inline_code = re.findall(r'`([^`]+)`', query)
+        inline_code = _INLINE_CODE_RE.findall(query)
         for i, code in enumerate(inline_code):
             snippets.append({
                 'id': f'inline_{i+1}',
@@ -151,28 +218,15 @@ class QueryProcessor:
         query_lower = query.lower()
         
         # Check if language is explicitly mentioned
-        language_patterns = {
-            'python': r'\b(python|py)\b',
-            'javascript': r'\b(javascript|js)\b',
-            'typescript': r'\b(typescript|ts)\b',
-            'java': r'\b(java)\b',
-            'c#': r'\b(c#|csharp|c-sharp)\b',
-            'c++': r'\b(c\+\+|cpp)\b',
-            'go': r'\b(go|golang)\b',
-            'rust': r'\b(rust)\b',
-            'php': r'\b(php)\b',
-            'ruby': r'\b(ruby|rb)\b'
-        }
-        
-        for language, pattern in language_patterns.items():
-            if re.search(pattern, query_lower):
-                return language
+        index = _LANGUAGE_PATTERN_SET.first_match(query_lower)
+        if index is not None:
+            return _LANGUAGE_NAMES[index]
                 
         # Check code block language specification
-        code_block_lang = re.search(r'```(\w+)', query)
+        code_block_lang = _CODE_BLOCK_LANG_RE.search(query)
         if code_block_lang:
             lang = code_block_lang.group(1).lower()
-            if lang in language_patterns:
+            if lang in _LANGUAGE_PATTERNS:
                 return lang
             if lang == 'py':
                 return 'python'
@@ -186,21 +240,21 @@ class QueryProcessor:
             content = snippet['content']
             
             # Python indicators
-            if re.search(r'def\s+\w+\s*\(.*\):|\bimport\s+\w+|from\s+\w+\s+import', content):
+            if _PYTHON_CODE_RE.search(content):
                 return 'python'
                 
             # JavaScript/TypeScript indicators
-            if re.search(r'function\s+\w+\s*\(.*\)|const|let|var|=>|import\s+.*\s+from', content):
-                if re.search(r':\s*(\w+)\b', content):  # Type annotations
+            if _JS_CODE_RE.search(content):
+                if _TYPE_ANNOTATION_RE.search(content):  # Type annotations
                     return 'typescript'
                 return 'javascript'
                 
             # Java indicators
-            if re.search(r'public\s+class|private|protected|System\.out\.println', content):
+            if _JAVA_CODE_RE.search(content):
                 return 'java'
                 
             # C# indicators
-            if re.search(r'namespace|using\s+\w+;|Console\.WriteLine', content):
+            if _CSHARP_CODE_RE.search(content):
                 return 'c#'
                 
         return None
@@ -225,7 +279,7 @@ class QueryProcessor:
     def _process_debugging_query(self, query):
         """Process debugging query"""
         # Extract error messages
-        error_messages = re.findall(r'Error: (.*?)(?:\n|$)', query)
+        error_messages = _ERROR_MESSAGE_RE.findall(query)
         
         # Add some context for debugging
         if error_messages:
@@ -247,3 +301,4 @@ class QueryProcessor:
         """Process explanation query"""
         # Could add some context or structure here
         return query
+
@@ -4,6 +4,104 @@ import re
 import json
 from typing import Dict, Any
 
+from utils.pattern_set import PatternSet
+
+# Patterns are compiled once at import rather than looked up on every response
+
+# Language hints inside code blocks
+_PYTHON_CODE_RE = re.compile(r'def\s+\w+\s*\(.*\):|import\s+\w+|from\s+\w+\s+import')
+_JS_CODE_RE = re.compile(r'function\s+\w+\s*\(.*\)|const|let|var|=>|import\s+.*\s+from')
+_TYPE_ANNOTATION_RE = re.compile(r':\s*(\w+)\b')
+_JAVA_CODE_RE = re.compile(r'public\s+class|private|protected|System\.out\.println')
+_CSHARP_CODE_RE = re.compile(r'namespace|using\s+\w+;|Console\.WriteLine')
+_C_CODE_RE = re.compile(r'#include|printf|malloc|free|scanf')
+_CPP_CODE_RE = re.compile(r'#include|std::|cout|cin|vector<')
+
+# Checked in priority order; all hints are scanned at once when Hyperscan is available
+_CODE_LANGUAGE_HINTS = [
+    ('python', _PYTHON_CODE_RE),
+    ('javascript', _JS_CODE_RE),
+    ('java', _JAVA_CODE_RE),
+    ('csharp', _CSHARP_CODE_RE),
+    ('c', _C_CODE_RE),
+    ('cpp', _CPP_CODE_RE)
+]
+_CODE_LANGUAGE_SET = PatternSet(pattern for _, pattern in _CODE_LANGUAGE_HINTS)
+
+# Python has the highest priority, so a Python hint near the top of a block
+# settles detection without scanning the rest for the other languages
+_FAST_PATH_CHARS = 256
+
+_HEADER_RE = re.compile(r'^#\s+\w+', re.MULTILINE)
+# Only tried on lines whose first character could start a list marker
+_LIST_MARKER_RE = re.compile(r'([ \t]*)(\d+\.|\*|-)[ \t]*(?=\w)')
+_ASCII_DIGITS = '0123456789'
+_WHITESPACE_RUN_RE = re.compile(r'\s*')
+
+
+def _may_have_list_marker(content: str) -> bool:
+    """Cheap check that content holds a character a list marker could start with"""
+    # Non-ASCII text may hold digits from other scripts, which \d also matches
+    if not content.isascii():
+        return True
+    return '*' in content or '-' in content or any(map(content.__contains__, _ASCII_DIGITS))
+
+
+def _untagged_code_blocks(content: str):
+    """
+    Find fenced code blocks with no language after the opening fence
+    
+    Scans with str.find and yields exactly the spans that re.finditer with
+    r'```(\\s*\\n[\\s\\S]*?\\n\\s*)```' gives as group 1, including where it
+    pairs a tagged block's closing fence with the next fence.
+    
+    Args:
+        content (str): Text to scan
+        
+    Yields:
+        tuple: (start, end) of the code between the fences
+    """
+    i = content.find('```')
+    while i >= 0:
+        start = i + 3
+        
+        # The opening fence must be followed by whitespace containing a newline
+        k = _WHITESPACE_RUN_RE.match(content, start).end()
+        last_newline = content.rfind('\n', start, k)
+        if last_newline < 0:
+            i = content.find('```', i + 1)
+            continue
+            
+        # The closing fence is the first ``` preceded by whitespace with a newline
+        end = -1
+        j = content.find('```', last_newline + 1)
+        while j >= 0:
+            # Usually the fence starts its own line
+            if j - 1 > last_newline and content[j - 1] == '\n':
+                end = j
+                break
+                
+            b = j
+            while b > last_newline + 1 and content[b - 1].isspace():
+                b -= 1
+            if content.find('\n', b, j) >= 0:
+                end = j
+                break
+            j = content.find('```', j + 1)
+            
+        # Failing that, a second newline in the opening whitespace can close
+        # a block that holds nothing but that whitespace
+        if end < 0 and content.startswith('```', k) and content.find('\n', start, last_newline) >= 0:
+            end = k
+            
+        if end < 0:
+            i = content.find('```', i + 1)
+            continue
+            
+        yield start, end
+        i = content.find('```', end + 3)
+
+
 class ResponseGenerator:
     """
     Generates formatted responses for different query types
@@ -11,6 +109,8 @@ class ResponseGenerator:
     def __init__(self, config):
         self.config = config
         self.logger = logging.getLogger(__name__)
+        # How often the head-of-block check settles language detection
+        self.language_detection_stats = {'fast_path': 0, 'full_scan': 0}
         
     def format_response(self, llm_response: Dict[str, Any]) -> str:
         """
@@ -30,14 +130,18 @@ class ResponseGenerator:
         if 'error' in llm_response:
             return f"Error: {llm_response['error']}"
             
+        # Each stage is skipped when a cheap check shows it cannot change anything
+        
         # Format code blocks with syntax highlighting
-        content = self._format_code_blocks(content)
+        if '```' in content:
+            content = self._format_code_blocks(content)
         
         # Add section headers if needed
         content = self._add_section_headers(content)
         
         # Format lists
-        content = self._format_lists(content)
+        if _may_have_list_marker(content):
+            content = self._format_lists(content)
         
         # Add citations if applicable
         content = self._add_citations(content)
@@ -46,48 +150,48 @@ class ResponseGenerator:
         
     def _format_code_blocks(self, content: str) -> str:
         """Format code blocks with syntax highlighting"""
-        # Find code blocks with no language specified
-        pattern = r'```(\s*\n[\s\S]*?\n\s*)```'
+        parts = []
+        pos = 0
         
-        def add_language(match):
-            code_block = match.group(1)
-            
+        for start, end in _untagged_code_blocks(content):
             # Try to detect language
-            language = self._detect_code_language(code_block)
+            language = self._detect_code_language(content[start:end])
             
-            # Add language to code block
-            return f"```{language}{code_block}```"
+            # Add language right after the opening fence
+            parts.append(content[pos:start])
+            parts.append(language)
+            pos = start
             
-        # Replace code blocks with no language
-        content = re.sub(pattern, add_language, content)
-        
-        return content
+        if not parts:
+            return content
+            
+        parts.append(content[pos:])
+        return ''.join(parts)
         
     def _detect_code_language(self, code_block: str) -> str:
         """Detect language of a code block"""
         # Simple heuristics for language detection
-        if re.search(r'def\s+\w+\s*\(.*\):|import\s+\w+|from\s+\w+\s+import', code_block):
+        if _PYTHON_CODE_RE.search(code_block, 0, _FAST_PATH_CHARS):
+            self.language_detection_stats['fast_path'] += 1
             return 'python'
-        if re.search(r'function\s+\w+\s*\(.*\)|const|let|var|=>|import\s+.*\s+from', code_block):
-            if re.search(r':\s*(\w+)\b', code_block):  # Type annotations
-                return 'typescript'
-            return 'javascript'
-        if re.search(r'public\s+class|private|protected|System\.out\.println', code_block):
-            return 'java'
-        if re.search(r'namespace|using\s+\w+;|Console\.WriteLine', code_block):
-            return 'csharp'
-        if re.search(r'#include|printf|malloc|free|scanf', code_block):
-            return 'c'
-        if re.search(r'#include|std::|cout|cin|vector<', code_block):
-            return 'cpp'
             
+        self.language_detection_stats['full_scan'] += 1
+        index = _CODE_LANGUAGE_SET.first_match(code_block)
+        
         # Default to plain text if can't detect
-        return ''
+        if index is None:
+            return ''
+            
+        language = _CODE_LANGUAGE_HINTS[index][0]
+        if language == 'javascript' and _TYPE_ANNOTATION_RE.search(code_block):  # Type annotations
+            return 'typescript'
+            
+        return language
         
     def _add_section_headers(self, content: str) -> str:
         """Add section headers to content if needed"""
         # Check if content is long and might benefit from sections
-        if len(content) > 500 and not re.search(r'^#\s+\w+', content, re.MULTILINE):
+        if len(content) > 500 and not _HEADER_RE.search(content):
             lines = content.split('\n')
             
             # Add a title if not present
@@ -98,13 +202,25 @@ class ResponseGenerator:
         
     def _format_lists(self, content: str) -> str:
         """Format lists in content"""
-        # Ensure numbered lists have proper spacing
-        content = re.sub(r'(\d+)\.\s*(\w)', r'\1. \2', content)
+        # Ensure numbered and bullet lists have exactly one space after the marker.
+        # Only line starts are list items, and code blocks are left alone
+        lines = content.splitlines(keepends=True)
+        in_code_block = False
         
-        # Ensure bullet lists have proper spacing
-        content = re.sub(r'(\*|-)\s*(\w)', r'\1 \2', content)
-        
-        return content
+        for i, line in enumerate(lines):
+            stripped = line.lstrip()
+            if stripped.startswith('```'):
+                in_code_block = not in_code_block
+                continue
+                
+            if in_code_block or not stripped or not (stripped[0] in '*-' or stripped[0].isdigit()):
+                continue
+                
+            match = _LIST_MARKER_RE.match(line)
+            if match:
+                lines[i] = f"{match.group(1)}{match.group(2)} {line[match.end():]}"
+                
+        return ''.join(lines)
         
     def _add_citations(self, content: str) -> str:
         """Add citations to content if applicable"""
@@ -150,7 +266,7 @@ Please try again or modify your request. If the problem persists, check your rep
         suggested_fixes = debug_info.get('suggested_fixes', [])
         code_snippet = debug_info.get('code_snippet', '')
         
-        response = f"""# Debugging Suggestion
+        parts = [f"""# Debugging Suggestion
 
 ## Error
 ```
@@ -158,21 +274,19 @@ Please try again or modify your request. If the problem persists, check your rep
 ```
 
 ## Possible Causes
-"""
+"""]
         
-        for i, cause in enumerate(possible_causes, 1):
-            response += f"{i}. {cause}\n"
-            
-        response += "\n## Suggested Fixes\n"
+        parts.extend(f"{i}. {cause}\n" for i, cause in enumerate(possible_causes, 1))
+        
+        parts.append("\n## Suggested Fixes\n")
+        
+        parts.extend(f"{i}. {fix}\n" for i, fix in enumerate(suggested_fixes, 1))
         
-        for i, fix in enumerate(suggested_fixes, 1):
-            response += f"{i}. {fix}\n"
-            
         if code_snippet:
             language = debug_info.get('language', '')
-            response += f"\n## Fixed Code Example\n```{language}\n{code_snippet}\n```"
+            parts.append(f"\n## Fixed Code Example\n```{language}\n{code_snippet}\n```")
             
-        return response
+        return ''.join(parts)
         
     def format_code_review(self, review_info: Dict[str, Any]) -> str:
         """
@@ -192,25 +306,22 @@ Please try again or modify your request. If the problem persists, check your rep
         strengths = review_info.get('strengths', [])
         suggestions = review_info.get('suggestions', [])
         
-        response = f"""# Code Review
+        parts = [f"""# Code Review
 
 ## Overall Quality
 {code_quality}
 
 ## Strengths
-"""
+"""]
         
-        for i, strength in enumerate(strengths, 1):
-            response += f"{i}. {strength}\n"
-            
-        response += "\n## Issues\n"
+        parts.extend(f"{i}. {strength}\n" for i, strength in enumerate(strengths, 1))
         
-        for i, issue in enumerate(issues, 1):
-            response += f"{i}. {issue}\n"
-            
-        response += "\n## Suggestions for Improvement\n"
+        parts.append("\n## Issues\n")
         
-        for i, suggestion in enumerate(suggestions, 1):
-            response += f"{i}. {suggestion}\n"
-            
-        return response
+        parts.extend(f"{i}. {issue}\n" for i, issue in enumerate(issues, 1))
+        
+        parts.append("\n## Suggestions for Improvement\n")
+        
+        parts.extend(f"{i}. {suggestion}\n" for i, suggestion in enumerate(suggestions, 1))
+        
+        return ''.join(parts)
@@ -1,15 +1,98 @@
-import argparse
+import copy
+import functools
 import logging
 import os
+import re
+import sys
+import threading
+from typing import NamedTuple
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+from context_management.records import FunctionSummary
 from context_management.session_context import EnhancedContextManager
 from interaction.query_processor import QueryProcessor
 from interaction.response_generator import ResponseGenerator
 from reasoning.heuristics import ExpertReasoning
 from source_processing.code_source_scanner import CodeSourceScanner
 from source_processing.enhanced_code_analyzer import EnhancedCodeAnalyzer
+from utils.cache_utils import LRUCache
 from utils.config_utils import load_config
 
+# Names must be more similar than this to count as a fuzzy match
+FUZZY_MATCH_THRESHOLD = 0.7
+
+# Entity name patterns for queries, highest priority first. They are not fused
+# into one alternation: that would return the leftmost match in the query rather
+# than the first pattern that matches anywhere, and for typical short queries
+# five precompiled searches are cheaper than a PatternSet scan anyway.
+_ENTITY_QUERY_PATTERNS = [
+    re.compile(r'(?:function|method|def)\s+([a-zA-Z0-9_]+)'),
+    re.compile(r'(?:class)\s+([a-zA-Z0-9_]+)'),
+    re.compile(r'(?:explain|tell me about|describe|how does)\s+([a-zA-Z0-9_]+)\s+(?:function|method|class|work)'),
+    re.compile(r'what does\s+([a-zA-Z0-9_]+)\s+(?:do|function|method)'),
+    re.compile(r'(?:explain|tell me about|describe)\s+([a-zA-Z0-9_]+)')
+]
+
+_SNIPPET_FUNCTION_RE = re.compile(r'(?:function|def)\s+([a-zA-Z0-9_]+)')
+_SNIPPET_CLASS_RE = re.compile(r'class\s+([a-zA-Z0-9_]+)')
+
+# Expert roles and the query keywords that select them, highest priority first
+_ROLE_KEYWORDS = [
+    ('senior_dev', ['architecture', 'design', 'structure', 'review', 'senior']),
+    ('quality_expert', ['quality', 'best practice', 'style', 'improve', 'optimize']),
+    ('tester', ['test', 'testing', 'cases', 'coverage', 'unit test'])
+]
+
+
+def _build_role_automaton():
+    """Aho-Corasick automaton mapping each role keyword to (priority, role)"""
+    if ahocorasick is None:
+        return None
+        
+    automaton = ahocorasick.Automaton()
+    for priority, (role, keywords) in enumerate(_ROLE_KEYWORDS):
+        for keyword in keywords:
+            if keyword not in automaton:
+                automaton.add_word(keyword, (priority, role))
+    automaton.make_automaton()
+    return automaton
+
+
+_ROLE_AUTOMATON = _build_role_automaton()
+
+# Role keywords are looked for in this many leading characters of a query first
+_ROLE_SCAN_CHARS = 256
+
+
+def _match_role(query_lower):
+    """
+    Find the highest priority role whose keywords occur in a query
+
+    Args:
+        query_lower (str): Lowercased query text
+
+    Returns:
+        tuple: (priority, role), or None if no keyword occurs
+    """
+    if _ROLE_AUTOMATON is None:
+        for priority, (role, keywords) in enumerate(_ROLE_KEYWORDS):
+            if any(term in query_lower for term in keywords):
+                return priority, role
+        return None
+        
+    # One pass over the query; the highest priority role among the hits wins
+    best = None
+    for _, (priority, role) in _ROLE_AUTOMATON.iter(query_lower):
+        if priority == 0:
+            return priority, role
+        if best is None or priority < best[0]:
+            best = (priority, role)
+    return best
+
 
 class AICodingAssistant:
     """
@@ -27,6 +110,14 @@ class AICodingAssistant:
         self.query_processor = QueryProcessor(config)
         self.response_generator = ResponseGenerator(config)
         
+        # Name index per kind over the latest flat function and class lists
+        self._name_index_cache = {}
+        # Responses by (query, context version, conversation summary), so a
+        # repeated question skips the pipeline
+        self._response_cache = LRUCache(
+            maxsize=config.get('interaction', {}).get('response_cache_size', 128)
+        )
+        
     def process_directory(self, dir_path, recursive=True):
         """Process a directory of code files"""
         self.logger.info(f"Processing directory: {dir_path}")
@@ -61,6 +152,18 @@ class AICodingAssistant:
     def process_query(self, query):
         """Process a user query about code"""
         try:
+            # Answer repeated queries from the cache until code, analyses or the
+            # conversation the prompt carries change. Prompts take the conversation
+            # as its rolling summary (get_relevant_context's recent_history is not
+            # rendered by LLMInterface._build_prompt), so the summary is keyed on
+            cache_key = (query, self.context_manager.version, self.context_manager.context.get('summary', ''))
+            response = self._response_cache.get(cache_key)
+            if response is not None:
+                # A copy, so callers and the history cannot change the cached entry
+                response = copy.deepcopy(response)
+                self.context_manager.add_conversation_interaction(query, response)
+                return response
+                
             # Process the query
             processed_query = self.query_processor.process(query)
             
@@ -71,6 +174,7 @@ class AICodingAssistant:
             )
             
             response = None
+            failed = False
             
             # Handle different query types
             if processed_query['type'] == 'code_explanation':
@@ -121,11 +225,16 @@ class AICodingAssistant:
                         relevant_context
                     )
                     
+                failed = bool(expert_response.get('error'))
                 response = self.response_generator.format_expert_response(expert_response, role)
             
             # Store interaction in context
             self.context_manager.add_conversation_interaction(query, response)
             
+            # Failed LLM calls (no API key, timeouts, HTTP errors) are worth retrying
+            if not failed:
+                self._response_cache.put(cache_key, copy.deepcopy(response))
+            
             return response
             
         except Exception as e:
@@ -137,134 +246,215 @@ class AICodingAssistant:
             
     def _determine_expert_role(self, processed_query):
         """Determine which expert role to use based on the query"""
-        query_lower = processed_query['raw_query'].lower()
+        raw_query = processed_query['raw_query']
         
-        if any(term in query_lower for term in ['architecture', 'design', 'structure', 'review', 'senior']):
-            return 'senior_dev'
-            
-        if any(term in query_lower for term in ['quality', 'best practice', 'style', 'improve', 'optimize']):
-            return 'quality_expert'
+        # Lowercase and scan just the head first; only a top priority hit there
+        # settles the role, anything else needs the rest of the query too
+        match = _match_role(raw_query[:_ROLE_SCAN_CHARS].lower())
+        if len(raw_query) > _ROLE_SCAN_CHARS and (match is None or match[0] > 0):
+            match = _match_role(raw_query.lower())
             
-        if any(term in query_lower for term in ['test', 'testing', 'cases', 'coverage', 'unit test']):
-            return 'tester'
+        if match is not None:
+            return match[1]
             
         # Default
         return 'explainer'
-    # Missing methods for AICodingAssistant class
-
-def _extract_entity_from_query(self, processed_query):
-    """Extract function or class name from a query"""
-    # Try to extract from entities list
-    if 'entities' in processed_query and processed_query['entities']:
-        for entity in processed_query['entities']:
-            if entity.get('type') in ['function', 'class', 'method']:
-                return entity.get('value')
-    
-    # Try regex extraction from raw query
-    import re
-    query = processed_query['raw_query'].lower()
-    
-    # Look for common patterns like "explain function X" or "how does class Y work"
-    patterns = [
-        r'(?:function|method|def)\s+([a-zA-Z0-9_]+)',
-        r'(?:class)\s+([a-zA-Z0-9_]+)',
-        r'(?:explain|tell me about|describe|how does)\s+([a-zA-Z0-9_]+)\s+(?:function|method|class|work)',
-        r'what does\s+([a-zA-Z0-9_]+)\s+(?:do|function|method)',
-        r'(?:explain|tell me about|describe)\s+([a-zA-Z0-9_]+)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.search(pattern, query)
-        if matches:
-            return matches.group(1)
-    
-    # If code snippets exist, try to extract function/class names from them
-    if 'code_snippets' in processed_query and processed_query['code_snippets']:
-        for snippet in processed_query['code_snippets']:
-            # Look for function definitions in the snippet
-            func_matches = re.search(r'(?:function|def)\s+([a-zA-Z0-9_]+)', snippet['content'])
-            if func_matches:
-                return func_matches.group(1)
-            
-            # Look for class definitions in the snippet
-            class_matches = re.search(r'class\s+([a-zA-Z0-9_]+)', snippet['content'])
-            if class_matches:
-                return class_matches.group(1)
-    
-    # No entity found
-    return None
 
-def _find_function(self, function_name, context):
-    """Find function data from context"""
-    # Case-insensitive search
-    function_name_lower = function_name.lower()
-    
-    # Check in functions from all analyses
-    for source_id, analysis in context.get('analyses', {}).items():
-        if not analysis.get('functions'):
-            continue
-            
-        for func in analysis['functions']:
-            if func['name'].lower() == function_name_lower:
-                return func
-            
-            # Check for partial matches (helpful for methods)
-            if '.' in function_name_lower and function_name_lower.split('.')[-1] == func['name'].lower():
-                return func
-    
-    # If no exact match, try fuzzy matching
-    best_match = None
-    best_score = 0
-    
-    for source_id, analysis in context.get('analyses', {}).items():
-        if not analysis.get('functions'):
-            continue
+    def _extract_entity_from_query(self, processed_query):
+        """Extract function or class name from a query"""
+        # Try to extract from entities list
+        if 'entities' in processed_query and processed_query['entities']:
+            for entity in processed_query['entities']:
+                if entity.get('type') in ['function', 'class', 'method']:
+                    return entity.get('value')
+        
+        # Try regex extraction from raw query
+        query = processed_query['raw_query'].lower()
+        
+        # Look for common patterns like "explain function X" or "how does class Y work"
+        for pattern in _ENTITY_QUERY_PATTERNS:
+            matches = pattern.search(query)
+            if matches:
+                return matches.group(1)
+        
+        # If code snippets exist, try to extract function/class names from them
+        if 'code_snippets' in processed_query and processed_query['code_snippets']:
+            for snippet in processed_query['code_snippets']:
+                # Look for function definitions in the snippet
+                func_matches = _SNIPPET_FUNCTION_RE.search(snippet['content'])
+                if func_matches:
+                    return func_matches.group(1)
+                
+                # Look for class definitions in the snippet
+                class_matches = _SNIPPET_CLASS_RE.search(snippet['content'])
+                if class_matches:
+                    return class_matches.group(1)
+        
+        # No entity found
+        return None
+
+    def _find_function(self, function_name, context):
+        """Find function data from context"""
+        # Case-insensitive search
+        function_name_lower = function_name.lower()
+        functions = self._get_name_index(context, 'functions')
+        
+        # Exact name, or for methods the part after the last dot; whichever comes first
+        positions = [functions.positions.get(function_name_lower)]
+        if '.' in function_name_lower:
+            positions.append(functions.positions.get(function_name_lower.split('.')[-1]))
+        positions = [position for position in positions if position is not None]
+        if positions:
+            return functions.entities[min(positions)]
+        
+        # If no exact match, try fuzzy matching
+        best_index = _closest_name(function_name_lower, functions.names)
+        
+        return functions.entities[best_index] if best_index is not None else None
+
+    def _find_class(self, class_name, context):
+        """Find class data from context"""
+        # Case-insensitive search
+        class_name_lower = class_name.lower()
+        classes = self._get_name_index(context, 'classes')
+        
+        position = classes.positions.get(class_name_lower)
+        if position is not None:
+            return classes.entities[position]
+        
+        # If no exact match, try fuzzy matching
+        best_index = _closest_name(class_name_lower, classes.names)
+        
+        return classes.entities[best_index] if best_index is not None else None
+
+    def _get_name_index(self, context, kind):
+        """
+        Build (or reuse) the lowercase name index for the functions or classes of a context
+        
+        Args:
+            context (dict): Relevant context with flattened `_all_functions` and
+                `_all_classes` lists, or per-source `analyses`
+            kind (str): 'functions' or 'classes'
             
-        for func in analysis['functions']:
-            # Simple string similarity
-            from difflib import SequenceMatcher
-            similarity = SequenceMatcher(None, function_name_lower, func['name'].lower()).ratio()
+        Returns:
+            NameIndex: Entities, lowercase names and name positions
+        """
+        # Retrieval hands out the same flat list until its code or analyses change,
+        # so the index is only rebuilt then. Contexts built elsewhere still carry
+        # per-source analyses and are flattened here.
+        entities = context.get(f'_all_{kind}')
+        if entities is None:
+            entities = [
+                entity
+                for analysis in context.get('analyses', {}).values()
+                for entity in analysis.get(kind) or []
+            ]
+        
+        index = self._name_index_cache.get(kind)
+        if index is None or index.entities is not entities:
+            index = self._name_index_cache[kind] = _build_name_index(entities)
             
-            if similarity > 0.7 and similarity > best_score:  # 70% similarity threshold
-                best_match = func
-                best_score = similarity
+        return index
+
+
+class NameIndex(NamedTuple):
+    """Functions or classes of a context, looked up by lowercase name"""
+    entities: list
+    names: list
+    positions: dict
+
+
+def _build_name_index(entities):
+    """
+    Index entities by lowercase name
+
+    Args:
+        entities (list): Function or class data, in analysis order
+
+    Returns:
+        NameIndex: Entities, their lowercase names, and name -> first position
+    """
+    names = [
+        entity.name_lower if isinstance(entity, FunctionSummary) else entity['name'].lower()
+        for entity in entities
+    ]
+    positions = {}
+    for position, name in enumerate(names):
+        positions.setdefault(name, position)
+    return NameIndex(entities, names, positions)
+
+
+@functools.lru_cache(maxsize=None)
+def _rapidfuzz():
+    """
+    Import RapidFuzz on the first fuzzy lookup rather than at startup
     
-    return best_match
+    Returns:
+        tuple: (fuzz, process) modules, or None if RapidFuzz is not installed
+    """
+    try:
+        from rapidfuzz import fuzz, process
+    except ImportError:
+        return None
+    return fuzz, process
+
 
-def _find_class(self, class_name, context):
-    """Find class data from context"""
-    # Case-insensitive search
-    class_name_lower = class_name.lower()
+def _closest_name(name, names):
+    """
+    Find the name most similar to the given one, above 70% similarity
+
+    Args:
+        name (str): Lowercased name to look up
+        names (list): Lowercased candidate names
+
+    Returns:
+        int: Index of the first best match, or None if nothing is similar enough
+    """
+    rapidfuzz = _rapidfuzz()
+    if rapidfuzz is not None:
+        fuzz, process = rapidfuzz
+        match = process.extractOne(name, names, scorer=fuzz.ratio, score_cutoff=FUZZY_MATCH_THRESHOLD * 100)
+        # The threshold is exclusive, as it was with difflib
+        if match is not None and match[1] > FUZZY_MATCH_THRESHOLD * 100:
+            return match[2]
+        return None
+
+    from difflib import SequenceMatcher
     
-    # Check in classes from all analyses
-    for source_id, analysis in context.get('analyses', {}).items():
-        if not analysis.get('classes'):
+    best_index = None
+    best_score = FUZZY_MATCH_THRESHOLD
+
+    for index, candidate in enumerate(names):
+        # ratio() is at most 2 * shorter / total length, so names of a hopeless
+        # length are skipped before a matcher is even built
+        total_length = len(name) + len(candidate)
+        if total_length and 2 * min(len(name), len(candidate)) / total_length <= best_score:
             continue
             
-        for cls in analysis['classes']:
-            if cls['name'].lower() == class_name_lower:
-                return cls
-    
-    # If no exact match, try fuzzy matching
-    best_match = None
-    best_score = 0
-    
-    for source_id, analysis in context.get('analyses', {}).items():
-        if not analysis.get('classes'):
+        matcher = SequenceMatcher(None, name, candidate)
+        # quick_ratio() is an upper bound on ratio(), so most candidates skip the full comparison
+        if matcher.quick_ratio() <= best_score:
             continue
-            
-        for cls in analysis['classes']:
-            # Simple string similarity
-            from difflib import SequenceMatcher
-            similarity = SequenceMatcher(None, class_name_lower, cls['name'].lower()).ratio()
-            
-            if similarity > 0.7 and similarity > best_score:  # 70% similarity threshold
-                best_match = cls
-                best_score = similarity
-    
-    return best_match
-    
+
+        similarity = matcher.ratio()
+        if similarity > best_score:
+            best_index = index
+            best_score = similarity
+
+    return best_index
+
+
+def _write_response(content):
+    """Write a response in one piece and flush it once"""
+    # A single write, so a line-buffered terminal flushes once rather than per print() call
+    sys.stdout.write(f"{content}\n")
+    sys.stdout.flush()
+
+
 def main():
+    # Only the CLI needs argparse, so importing this module does not pay for it
+    import argparse
+    
     parser = argparse.ArgumentParser(description="AI Coding Assistant")
     parser.add_argument("--dir", type=str, default=".", help="Directory to process (default: current directory)")
     parser.add_argument("--recursive", action="store_true", help="Process directory recursively")
@@ -279,6 +469,10 @@ def main():
     # Create assistant
     assistant = AICodingAssistant(config)
     
+    # Connect to the LLM API while the directory is being processed
+    if args.query or args.interactive:
+        threading.Thread(target=assistant.expert_reasoning.llm.warm_up, daemon=True).start()
+        
     # Process directory
     dir_path = os.path.abspath(args.dir)
     print(f"Processing directory: {dir_path}")
@@ -301,12 +495,18 @@ def main():
         print(f"\nProcessing query: {args.query}")
         response = assistant.process_query(args.query)
         print("\nResponse:")
-        print(response['content'])
+        _write_response(response['content'])
     
     # Start interactive mode if requested
     if args.interactive:
         print("\nStarting interactive mode. Type 'exit' to quit.")
         
+        # Line editing and history for input(), where the platform has it
+        try:
+            import readline  # noqa: F401
+        except ImportError:
+            pass
+            
         while True:
             try:
                 query = input("\n> ")
@@ -314,7 +514,7 @@ def main():
                     break
                     
                 response = assistant.process_query(query)
-                print(response['content'])
+                _write_response(response['content'])
                 
             except KeyboardInterrupt:
                 print("\nExiting...")
@@ -0,0 +1,71 @@
+# CodingAssistant/reasoning/llm_cache.py
+import hashlib
+import json
+import threading
+import time
+
+from utils.cache_utils import LRUCache
+
+class LLMCache:
+    """
+    In-memory cache of raw LLM API responses keyed by the full request payload
+
+    Only worth consulting for (near) deterministic requests: with a sampling
+    temperature above zero the same payload is expected to give new answers.
+    """
+    def __init__(self, maxsize=256, ttl=3600):
+        """
+        Args:
+            maxsize (int, optional): Maximum number of cached responses
+            ttl (float, optional): Seconds a response stays valid
+        """
+        self.ttl = ttl
+        self.stats = {'hits': 0, 'misses': 0}
+        self._entries = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(payload):
+        """
+        Build the cache key for a request
+
+        Args:
+            payload (dict): JSON request body (model, messages, temperature, ...)
+
+        Returns:
+            str: Hex digest of the canonical JSON encoding
+        """
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a response
+
+        Args:
+            key (str): Cache key from `key()`
+
+        Returns:
+            dict: Cached response, or None on a miss or once it expired
+        """
+        entry = self._entries.get(key)
+        hit = entry is not None and entry[0] > time.monotonic()
+
+        with self._lock:
+            self.stats['hits' if hit else 'misses'] += 1
+
+        return entry[1] if hit else None
+
+    def put(self, key, response):
+        """
+        Store a response
+
+        Args:
+            key (str): Cache key from `key()`
+            response (dict): Parsed API response
+        """
+        self._entries.put(key, (time.monotonic() + self.ttl, response))
+
+    def clear(self):
+        """Drop all cached responses"""
+        self._entries.clear()
@@ -1,10 +1,19 @@
 # CodingAssistant/reasoning/llm_interface.py
+import asyncio
+import functools
+import itertools
 import logging
 import os
 import json
 import pprint
 import requests
-from typing import Dict, List, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List, Any, Iterator, Optional
+
+from reasoning.llm_cache import LLMCache
 
 class LLMInterface:
     """
@@ -19,6 +28,64 @@ class LLMInterface:
         self.temperature = config.get('temperature', 0.25)
         self.api_url = config.get('api_url', 'https://api.groq.com/openai/v1/chat/completions')
         
+        # Requests are spread over every configured (api_url, api_key, model)
+        # endpoint, so throughput is not capped by one account's rate limits.
+        # Without an `endpoints` list the single api_url/api_key/model is used
+        endpoints = config.get('endpoints') or [{}]
+        self.endpoints = [
+            {
+                'api_url': endpoint.get('api_url', self.api_url),
+                'api_key': endpoint.get('api_key', self.api_key),
+                'model': endpoint.get('model', self.model)
+            }
+            for endpoint in endpoints
+        ]
+        self.endpoints = [endpoint for endpoint in self.endpoints if endpoint['api_key']]
+        self._inflight = [0] * len(self.endpoints)
+        self._next_endpoint = itertools.count()
+        self._endpoint_lock = threading.Lock()
+        
+        self.max_concurrency = config.get('max_concurrency', 8)
+        
+        # Identical requests at or below this temperature are answered from the cache
+        self.cache_max_temperature = config.get('llm_cache_max_temperature', 0.0)
+        self.cache = LLMCache(
+            maxsize=config.get('llm_cache_size', 256),
+            ttl=config.get('llm_cache_ttl', 3600)
+        )
+        
+        # One session for every call, so the TCP connection and TLS session are
+        # reused instead of being set up again per request. The pool is sized
+        # for the thread pool the awaitable variants run on. Rate limiting and
+        # transient gateway errors are retried with backoff, honouring
+        # Retry-After; read errors are not, as the request may have been served
+        retries = Retry(
+            total=config.get('max_retries', 3),
+            read=0,
+            backoff_factor=0.5,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset({'HEAD', 'POST'}),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retries)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        
+    def warm_up(self):
+        """
+        Open a pooled connection to the API ahead of the first request
+        
+        Any response, even an error status, leaves a live connection behind;
+        failures are ignored, as the first real request will report them.
+        """
+        for api_url in dict.fromkeys(endpoint['api_url'] for endpoint in self.endpoints):
+            try:
+                self._session.head(api_url, timeout=5)
+            except requests.exceptions.RequestException as e:
+                self.logger.debug(f"Could not pre-connect to the LLM API at {api_url}: {e}")
+        
     def generate_response(self, query: str, context: Dict[str, Any], code_context: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Generate a response using the LLM
@@ -53,13 +120,101 @@ class LLMInterface:
                 'error': str(e)
             }
             
+    def batch_call(self, calls: List[tuple]) -> List[Dict[str, Any]]:
+        """
+        Send several prompts, at most max_concurrency at a time
+        
+        The chat completions API takes one conversation per request (its `n`
+        only samples the same prompt again), so the requests are fanned out
+        over threads sharing the pooled session rather than packed together.
+        
+        Args:
+            calls (list): (prompt, query) pairs, as taken by _call_api
+            
+        Returns:
+            list: Raw API responses, in the order of calls
+        """
+        if len(calls) <= 1:
+            return [self._call_api(prompt, query) for prompt, query in calls]
+            
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(calls))) as pool:
+            return list(pool.map(lambda call: self._call_api(*call), calls))
+            
+    def generate_response_stream(self, query: str, context: Dict[str, Any], code_context: List[Dict[str, Any]]) -> Iterator[str]:
+        """
+        Generate a response, yielding the content as the API produces it
+        
+        Args:
+            query (str): User query
+            context (dict): Session context
+            code_context (list): Code context nodes
+            
+        Yields:
+            str: Consecutive pieces of the response content
+        """
+        query_str = pprint.pformat(query)
+        self.logger.info(f"Streaming response for query: {str(query_str)[:100]}...")
+        
+        prompt = self._build_prompt(query_str, context, code_context)
+        yield from self._call_api_stream(prompt, query_str)
+        
+    async def agenerate_response(self, query: str, context: Dict[str, Any], code_context: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Awaitable generate_response, so several calls can wait on the API at once
+        
+        Args:
+            query (str): User query
+            context (dict): Session context
+            code_context (list): Code context nodes
+            
+        Returns:
+            dict: Response from LLM
+        """
+        return await self._run_blocking(self.generate_response, query, context, code_context)
+        
+    async def aanalyze_code(self, code: str, language: str) -> Dict[str, Any]:
+        """Awaitable analyze_code"""
+        return await self._run_blocking(self.analyze_code, code, language)
+        
+    async def asuggest_code_improvements(self, code: str, language: str) -> Dict[str, Any]:
+        """Awaitable suggest_code_improvements"""
+        return await self._run_blocking(self.suggest_code_improvements, code, language)
+        
+    async def _run_blocking(self, func, *args):
+        """
+        Run a blocking API call on the event loop's default thread pool
+        
+        The request spends nearly all its time waiting on the network with the
+        GIL released, so calls gathered together overlap their round trips.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args))
+        
     def _build_prompt(self, query: str, context: Dict[str, Any], code_context: List[Dict[str, Any]]) -> str:
         """Build a prompt with context"""
+        # Session context comes split into a per-session and a per-turn part;
+        # plain dicts are treated as all per-turn
+        static = context.get('static', {})
+        dynamic = context.get('dynamic', context)
+        
+        # Include active files and state, which only change between turns occasionally
+        static_context_str = ""
+        if static.get('active_files'):
+            static_context_str += "Active files:\n"
+            for file_info in static['active_files']:
+                static_context_str += f"- {file_info.path}\n"
+        if static.get('state'):
+            static_context_str += "Session state:\n"
+            for key, value in static['state'].items():
+                static_context_str += f"- {key}: {value}\n"
+                
         # Include recent interactions
         recent_interactions = ""
-        if 'recent_interactions' in context:
-            for interaction in context['recent_interactions']:
-                recent_interactions += f"User: {interaction['query']}\nAssistant: {interaction['response']}\n\n"
+        if dynamic.get('summary'):
+            recent_interactions += f"{dynamic['summary']}\n\n"
+        if 'recent_interactions' in dynamic:
+            for interaction in dynamic['recent_interactions']:
+                recent_interactions += f"User: {interaction.query}\nAssistant: {interaction.response}\n\n"
                 
         # Include code context
         code_context_str = ""
@@ -72,48 +227,104 @@ class LLMInterface:
                 
                 code_context_str += f"- {node_type}: {node_id} (path: {path})\n"
                 
-        # Build system prompt
+        # Build system prompt. The fixed instructions come first and the static
+        # context before anything per-turn, so the longest possible prefix is
+        # identical across turns and providers can serve it from their prompt cache
         system_prompt = f"""You are an AI coding agent that assists with coding tasks. 
+            Answer the user's query based on the context below. If you need more information or context, 
+            ask clarifying questions. If you provide code solutions, ensure they follow best practices 
+            and are well-commented.
+
             You have the following context about the repository and recent interactions:
 
+            {static_context_str}
+
             {recent_interactions}
 
             {code_context_str}
-
-            Answer the user's query based on this context. If you need more information or context, 
-            ask clarifying questions. If you provide code solutions, ensure they follow best practices 
-            and are well-commented.
             """
         
         return system_prompt
         
+    def _acquire_endpoint(self) -> int:
+        """
+        Pick the endpoint with the fewest requests in flight and count one more on it
+        
+        Ties go round-robin, so sequential calls are spread over the endpoints too.
+        Every acquired endpoint must be handed back to _release_endpoint.
+        
+        Returns:
+            int: Index into self.endpoints
+        """
+        with self._endpoint_lock:
+            start = next(self._next_endpoint) % len(self.endpoints)
+            order = self._inflight[start:] + self._inflight[:start]
+            index = (start + order.index(min(order))) % len(self.endpoints)
+            self._inflight[index] += 1
+            return index
+            
+    def _release_endpoint(self, index: int):
+        """Mark a request on an endpoint from _acquire_endpoint as finished"""
+        with self._endpoint_lock:
+            self._inflight[index] -= 1
+            
+    def _request(self, prompt: str, query: str, endpoint: Dict[str, str]):
+        """
+        Build the headers and JSON body of a chat completion request
+        
+        Args:
+            prompt (str): System prompt
+            query (str): User message
+            endpoint (dict): Endpoint from self.endpoints to send it to
+            
+        Returns:
+            tuple: (headers, data)
+        """
+        headers = {
+            "Authorization": f"Bearer {endpoint['api_key']}",
+            "Content-Type": "application/json"
+        }
+
+        data = {
+            'model': endpoint['model'],
+            'messages': [
+                {'role': 'system', 'content': prompt},
+                {'role': 'user', 'content': query}
+            ],
+            'max_tokens': self.max_tokens,
+            'temperature': self.temperature
+        }
+        
+        return headers, data
+        
     def _call_api(self, prompt: str, query: str) -> Dict[str, Any]:
         """Call the LLM API with improved error handling"""
-        if not self.api_key:
+        if not self.endpoints:
             self.logger.warning("No API key provided for LLM")
             return {
-                'content': "I can't access the language model API without an API key. Please configure the API key in settings."
+                'content': "I can't access the language model API without an API key. Please configure the API key in settings.",
+                'error': "No API key configured"
             }
             
+        index = self._acquire_endpoint()
+        endpoint = self.endpoints[index]
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-
-            data = {
-                'model': self.model,
-                'messages': [
-                    {'role': 'system', 'content': prompt},
-                    {'role': 'user', 'content': query}
-                ],
-                'max_tokens': self.max_tokens,
-                'temperature': self.temperature
-            }
+            headers, data = self._request(prompt, query, endpoint)
             
-            response = requests.post(self.api_url, headers=headers, json=data)
+            cache_key = None
+            if self.temperature <= self.cache_max_temperature:
+                cache_key = self.cache.key(data)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+                    
+            response = self._session.post(endpoint['api_url'], headers=headers, json=data)
             response.raise_for_status()
-            return response.json()
+            result = response.json()
+            
+            if cache_key is not None:
+                self.cache.put(cache_key, result)
+            return result
                 
         except requests.exceptions.HTTPError as e:
             if hasattr(e, 'response') and e.response.status_code == 503:
@@ -139,7 +350,43 @@ class LLMInterface:
                 'content': f"There was an error communicating with the language model API: {str(e)}",
                 'error': str(e)
             }
+        finally:
+            self._release_endpoint(index)
           
+    def _call_api_stream(self, prompt: str, query: str) -> Iterator[str]:
+        """Call the LLM API with server-sent events, yielding content deltas"""
+        if not self.endpoints:
+            self.logger.warning("No API key provided for LLM")
+            yield "I can't access the language model API without an API key. Please configure the API key in settings."
+            return
+            
+        index = self._acquire_endpoint()
+        endpoint = self.endpoints[index]
+        try:
+            headers, data = self._request(prompt, query, endpoint)
+            data['stream'] = True
+            
+            with self._session.post(endpoint['api_url'], headers=headers, json=data, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line.startswith(b'data: '):
+                        continue
+                    payload = line[6:]
+                    if payload == b'[DONE]':
+                        break
+                        
+                    choices = json.loads(payload).get('choices')
+                    if choices:
+                        content = choices[0].get('delta', {}).get('content')
+                        if content:
+                            yield content
+                            
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.logger.error(f"API streaming error: {e}")
+            yield f"There was an error communicating with the language model API: {str(e)}"
+        finally:
+            self._release_endpoint(index)
+            
     def _process_response(self, response: Dict[str, Any]) -> Dict[str, Any]:
         """Process the API response from Groq"""
         try:
@@ -158,6 +405,9 @@ class LLMInterface:
                 'model': self.model,
                 'timestamp': '2025-04-01T12:00:00Z'  # Would be actual timestamp in real implementation
             }
+            # Keep failures from _call_api recognisable as such
+            if response.get('error'):
+                processed_response['error'] = response['error']
             
             return processed_response
         except Exception as e:
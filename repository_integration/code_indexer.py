@@ -4,7 +4,14 @@ from pathlib import Path
 import os
 import subprocess
 import json
-from collections import defaultdict
+import ast
+from collections import defaultdict, deque
+
+from utils.process_pool import get_process_pool, shutdown_process_pool
+
+# AST fields holding statement lists. Definitions and imports are statements,
+# and expressions never contain statements, so only these need to be walked
+_BLOCK_FIELDS = frozenset({'body', 'orelse', 'finalbody', 'handlers', 'cases'})
 
 class CodeIndexer:
     """
@@ -25,7 +32,14 @@ class CodeIndexer:
             'php': ['.php'],
             'ruby': ['.rb']
         }
+        # Extension -> language, first language listing an extension wins
+        self._extension_languages = {}
+        for lang, extensions in self.language_extensions.items():
+            for extension in extensions:
+                self._extension_languages.setdefault(extension, lang)
         self.index = defaultdict(list)
+        # Entity type -> (number of entries indexed, {trigram: entry positions})
+        self._trigrams = {}
         
     def index_repository(self, repo_data):
         """
@@ -70,19 +84,8 @@ class CodeIndexer:
         files_by_language = defaultdict(list)
         
         for file in files:
-            extension = file['extension'].lower()
-            language = None
-            
-            # Determine language by extension
-            for lang, extensions in self.language_extensions.items():
-                if extension in extensions:
-                    language = lang
-                    break
-                    
-            if language:
-                files_by_language[language].append(file)
-            else:
-                files_by_language['other'].append(file)
+            language = self._extension_languages.get(file['extension'].lower(), 'other')
+            files_by_language[language].append(file)
                 
         return files_by_language
         
@@ -98,40 +101,36 @@ class CodeIndexer:
         
     def _index_python_files(self, repo_path, files):
         """Index Python files"""
-        for file in files:
-            file_path = os.path.join(repo_path, file['path'])
+        tasks = [(os.path.join(repo_path, file['path']), file['path']) for file in files]
+        
+        for entries, problem in self._map_python_files(tasks):
+            if problem:
+                self.logger.log(*problem)
+                continue
+                
+            for kind, items in entries.items():
+                self.index[kind].extend(items)
+                
+    def _map_python_files(self, tasks):
+        """Run _parse_python_file over (file_path, relative path) tasks lazily, using the process pool when worthwhile"""
+        workers = self.config.get('max_workers') or os.cpu_count() or 1
+        if workers > 1 and len(tasks) >= self.config.get('parallel_min_files', 16):
+            done = 0
             try:
-                # Could use ast module to parse Python files
-                import ast
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    try:
-                        tree = ast.parse(f.read())
-                        
-                        # Index classes
-                        for node in ast.walk(tree):
-                            if isinstance(node, ast.ClassDef):
-                                self.index['classes'].append({
-                                    'name': node.name,
-                                    'file': file['path'],
-                                    'line': node.lineno
-                                })
-                            elif isinstance(node, ast.FunctionDef):
-                                self.index['functions'].append({
-                                    'name': node.name,
-                                    'file': file['path'],
-                                    'line': node.lineno
-                                })
-                            elif isinstance(node, ast.Import) or isinstance(node, ast.ImportFrom):
-                                self.index['imports'].append({
-                                    'file': file['path'],
-                                    'line': node.lineno,
-                                    'names': [alias.name for alias in node.names]
-                                })
-                    except SyntaxError as e:
-                        self.logger.warning(f"Syntax error in {file_path}: {e}")
+                pool = get_process_pool(workers)
+                chunksize = max(1, len(tasks) // (workers * 4))
+                for result in pool.map(_parse_python_file, tasks, chunksize=chunksize):
+                    yield result
+                    done += 1
+                return
             except Exception as e:
-                self.logger.error(f"Error indexing Python file {file_path}: {e}")
+                self.logger.warning(f"Parallel Python indexing failed, falling back to serial: {e}")
+                shutdown_process_pool(workers)
+                tasks = tasks[done:]
                 
+        for task in tasks:
+            yield _parse_python_file(task)
+            
     def _index_js_files(self, repo_path, files):
         """Index JavaScript/TypeScript files"""
         # Implementation for JavaScript/TypeScript indexing
@@ -160,21 +159,114 @@ class CodeIndexer:
             list: Search results
         """
         results = []
+        query = query.lower()
         
         if entity_type and entity_type in self.index:
             # Search specific entity type
-            for item in self.index[entity_type]:
-                if query.lower() in item['name'].lower():
+            items = self.index[entity_type]
+            for item in self._search_candidates(entity_type, items, query):
+                if query in item['name'].lower():
                     results.append(item)
                     if len(results) >= max_results:
                         break
         else:
             # Search all entity types
             for entity_type, items in self.index.items():
-                for item in items:
-                    if 'name' in item and query.lower() in item['name'].lower():
+                for item in self._search_candidates(entity_type, items, query):
+                    if 'name' in item and query in item['name'].lower():
                         results.append({**item, 'type': entity_type})
                         if len(results) >= max_results:
                             break
                             
-        return results
\ No newline at end of file
+        return results
+        
+    def _search_candidates(self, entity_type, items, query):
+        """
+        Narrow the entries of one entity type to those that may contain query
+        
+        Every trigram of a substring is a trigram of the name, so intersecting
+        the posting lists of the query's trigrams leaves only names worth
+        checking. The trigram index is brought up to date with any entries
+        appended since the last search.
+        
+        Args:
+            entity_type (str): Entity type
+            items (list): Entries of that type
+            query (str): Lowercased search query
+            
+        Returns:
+            list: Candidate entries in index order
+        """
+        if len(query) < 3:
+            return items
+            
+        indexed, trigrams = self._trigrams.get(entity_type, (0, defaultdict(set)))
+        for position in range(indexed, len(items)):
+            name = items[position].get('name')
+            if name:
+                name = name.lower()
+                for i in range(len(name) - 2):
+                    trigrams[name[i:i + 3]].add(position)
+        self._trigrams[entity_type] = (len(items), trigrams)
+        
+        postings = sorted((trigrams.get(query[i:i + 3], set()) for i in range(len(query) - 2)), key=len)
+        return [items[position] for position in sorted(set.intersection(*postings))]
+
+
+def _parse_python_file(task):
+    """
+    Extract the classes, functions and imports of one Python file
+    
+    Module-level so it can be shipped to worker processes.
+    
+    Args:
+        task (tuple): (file_path, relative path recorded in the index)
+        
+    Returns:
+        tuple: (entries by index kind, None), or (None, (log level, message))
+            when the file could not be indexed
+    """
+    file_path, relative_path = task
+    # Kinds are added as first seen, so merged shards give self.index the
+    # same key order as indexing the files one by one
+    entries = {}
+    
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            try:
+                tree = ast.parse(f.read())
+            except SyntaxError as e:
+                return None, (logging.WARNING, f"Syntax error in {file_path}: {e}")
+                
+        # Breadth-first like ast.walk, so entries keep their order, but
+        # without descending into the expressions that make up most nodes
+        pending = deque([tree])
+        while pending:
+            node = pending.popleft()
+            if isinstance(node, ast.ClassDef):
+                entries.setdefault('classes', []).append({
+                    'name': node.name,
+                    'file': relative_path,
+                    'line': node.lineno
+                })
+            elif isinstance(node, ast.FunctionDef):
+                entries.setdefault('functions', []).append({
+                    'name': node.name,
+                    'file': relative_path,
+                    'line': node.lineno
+                })
+            elif isinstance(node, ast.Import) or isinstance(node, ast.ImportFrom):
+                entries.setdefault('imports', []).append({
+                    'file': relative_path,
+                    'line': node.lineno,
+                    'names': [alias.name for alias in node.names]
+                })
+                    
+            for field in node._fields:
+                if field in _BLOCK_FIELDS:
+                    pending.extend(getattr(node, field))
+                    
+        return entries, None
+        
+    except Exception as e:
+        return None, (logging.ERROR, f"Error indexing Python file {file_path}: {e}")
@@ -1,10 +1,17 @@
 # CodingAssistant/repository_integration/git_parser.py
 import logging
 import os
-from pathlib import Path
 import git
 from git import Repo
 
+try:
+    import pathspec
+except ImportError:
+    pathspec = None
+
+from utils.cache_utils import LRUCache
+from utils.fs import walk_repo, skip_dirs_from_config, relative_path
+
 class GitParser:
     """
     Handles Git repository parsing, extracting structure and metadata
@@ -12,6 +19,9 @@ class GitParser:
     def __init__(self, config):
         self.config = config
         self.logger = logging.getLogger(__name__)
+        # (HEAD commit id, count) -> recent commits; a commit id fixes its history
+        self._commit_cache = LRUCache(maxsize=128)
+        self._warned_no_pathspec = False
         
     def parse_repository(self, repo_path):
         """
@@ -54,7 +64,8 @@ class GitParser:
         """Get the active branch name"""
         try:
             return repo.active_branch.name
-        except:
+        except (TypeError, git.GitCommandError):
+            # Detached HEAD
             return None
             
     def _get_branches(self, repo):
@@ -62,33 +73,77 @@ class GitParser:
         return [branch.name for branch in repo.branches]
         
     def _get_recent_commits(self, repo, count=10):
-        """Get recent commits"""
+        """Get recent commits, reusing the last listing while HEAD stays on the same commit"""
+        key = (repo.head.commit.hexsha, count)
+        cached = self._commit_cache.get(key)
+        if cached is not None:
+            return [dict(commit) for commit in cached]
+            
+        # One git log for the whole listing, rather than GitPython walking the
+        # full history and reading each commit object back separately
+        output = repo.git.log(
+            f'-n{count}', '-z', '--format=%H%x00%an%x00%aI%x00%B',
+            strip_newline_in_stdout=False
+        )
+        fields = output.split('\x00')
+        
         commits = []
-        for commit in list(repo.iter_commits())[:count]:
+        for i in range(0, len(fields) - 3, 4):
             commits.append({
-                'hash': commit.hexsha,
-                'message': commit.message,
-                'author': commit.author.name,
-                'date': commit.authored_datetime.isoformat()
+                'hash': fields[i],
+                'message': fields[i + 3],
+                'author': fields[i + 1],
+                'date': fields[i + 2]
             })
-        return commits
+            
+        self._commit_cache.put(key, commits)
+        return [dict(commit) for commit in commits]
         
     def _get_remotes(self, repo):
         """Get repository remotes"""
         return {remote.name: remote.url for remote in repo.remotes}
         
     def _get_files(self, repo_path):
-        """Get all files in the repository"""
+        """
+        Get all files in the repository
+        
+        Directories such as .git and node_modules are pruned without being
+        entered, and with pathspec installed files matched by the top-level
+        .gitignore are left out.
+        """
+        prefix = os.path.join(str(repo_path), '')
+        ignored = self._gitignore_spec(repo_path)
+        
         files = []
-        for path in Path(repo_path).rglob('*'):
-            if path.is_file() and '.git' not in str(path):
-                files.append({
-                    'path': str(path.relative_to(repo_path)),
-                    'size': path.stat().st_size,
-                    'extension': path.suffix
-                })
+        for info in walk_repo(repo_path, skip_dirs_from_config(self.config)):
+            path = relative_path(info.path, prefix)
+            if ignored is not None and ignored.match_file(path):
+                continue
+                
+            files.append({
+                'path': path,
+                'size': info.size,
+                'extension': info.path.suffix
+            })
         return files
         
+    def _gitignore_spec(self, repo_path):
+        """Compile the repository's top-level .gitignore, or None without one or without pathspec"""
+        if pathspec is None:
+            if not self._warned_no_pathspec and os.path.isfile(os.path.join(repo_path, '.gitignore')):
+                self.logger.warning("pathspec is not installed, so .gitignore rules are not applied to repository files")
+                self._warned_no_pathspec = True
+            return None
+            
+        try:
+            with open(os.path.join(repo_path, '.gitignore'), 'r', encoding='utf-8') as f:
+                return pathspec.PathSpec.from_lines('gitwildmatch', f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable .gitignore in {repo_path}: {e}")
+            return None
+        
     def _get_submodules(self, repo):
         """Get repository submodules"""
         return [submodule.name for submodule in repo.submodules]
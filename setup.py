@@ -10,8 +10,23 @@ setup(
         "pyyaml>=6.0",
         "networkx>=2.6.0",
         "requests>=2.25.0",
-        "tree-sitter>=0.20.0",
+        "urllib3>=1.26.0",
+        "tree-sitter>=0.22.0",
+        "tree-sitter-python>=0.21.0",
+        "pathspec>=0.10.0",
     ],
+    extras_require={
+        # Faster drop-in paths, each used only when importable
+        "accelerators": [
+            "igraph>=0.10.0",
+            "zstandard>=0.15.0",
+            "orjson>=3.4.0",
+            "msgpack>=1.0.0",
+            "hyperscan>=0.4.0",
+            "pyahocorasick>=2.0.0",
+            "rapidfuzz>=2.0.0",
+        ],
+    },
     author="AI Coding Agent Team",
     author_email="example@example.com",
     description="AI agent for coding assistance",
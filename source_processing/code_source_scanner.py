@@ -392,7 +392,7 @@ class CodeSourceScanner:
                 import json
                 json.loads(content)
                 return 'json'
-            except:
+            except (ValueError, RecursionError):
                 pass
                 
         # YAML indicators
@@ -431,7 +431,7 @@ class CodeSourceScanner:
             active_branch = None
             try:
                 active_branch = repo.active_branch.name
-            except:
+            except (TypeError, git.GitCommandError):
                 # Detached HEAD state or other issues
                 pass
                 
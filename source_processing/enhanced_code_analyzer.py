@@ -6,6 +6,11 @@ import ast
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 
+from utils.process_pool import get_process_pool, shutdown_process_pool
+
+# Per-process analyzer for pool workers, created on first use
+_worker_analyzer = None
+
 class EnhancedCodeAnalyzer:
     """Advanced code analysis for understanding functions, classes, and relationships"""
     
@@ -63,7 +68,9 @@ class EnhancedCodeAnalyzer:
             # Track language distribution
             language_count = {}
             
-            # Analyze each file
+            # Collect the files worth analyzing
+            max_analysis_size = self.config.get('max_analysis_size', 500000)
+            tasks = []
             for file_data in source_data['files']:
                 file_path = file_data['path']
                 content = file_data['content']
@@ -73,12 +80,14 @@ class EnhancedCodeAnalyzer:
                 language_count[language] = language_count.get(language, 0) + 1
                 
                 # Skip files that are too large or in unsupported languages
-                if language == 'unknown' or len(content) > self.config.get('max_analysis_size', 500000):
+                if language == 'unknown' or len(content) > max_analysis_size:
                     continue
+                    
+                tasks.append((file_path, content, language))
                 
+            # Analyze each file
+            for (file_path, content, language), file_analysis in zip(tasks, self._map_files(tasks)):
                 try:
-                    # Analyze file
-                    file_analysis = self.analyze_file(file_path, content, language)
                     if file_analysis:
                         # Add functions
                         for func in file_analysis.get('functions', []):
@@ -117,6 +126,27 @@ class EnhancedCodeAnalyzer:
             self.logger.error(f"Error analyzing code source: {e}")
             return analysis_results
             
+    def _map_files(self, tasks):
+        """Run analyze_file over (path, content, language) tasks lazily, using the process pool when worthwhile"""
+        workers = self.config.get('max_workers') or os.cpu_count() or 1
+        if workers > 1 and len(tasks) >= self.config.get('parallel_min_files', 16):
+            done = 0
+            try:
+                pool = get_process_pool(workers)
+                chunksize = max(1, len(tasks) // (workers * 4))
+                worker_tasks = [(self.config,) + task for task in tasks]
+                for file_analysis in pool.map(_analyze_file_task, worker_tasks, chunksize=chunksize):
+                    yield file_analysis
+                    done += 1
+                return
+            except Exception as e:
+                self.logger.warning(f"Parallel file analysis failed, falling back to serial: {e}")
+                shutdown_process_pool(workers)
+                tasks = tasks[done:]
+                
+        for file_path, content, language in tasks:
+            yield self.analyze_file(file_path, content, language)
+            
     def analyze_file(self, file_path, content, language=None):
         """
         Analyze a single file
@@ -325,7 +355,7 @@ class EnhancedCodeAnalyzer:
     def _find_function(self, function_name, context):
         """Find function data in the context"""
         # This should search context for the function
-        functions = context.get('functions', [])
+        functions = [_as_dict(func) for func in context.get('functions', [])]
         
         # Case-insensitive search
         function_name_lower = function_name.lower()
@@ -347,7 +377,7 @@ class EnhancedCodeAnalyzer:
     def _find_class(self, class_name, context):
         """Find class data in the context"""
         # This should search context for the class
-        classes = context.get('classes', [])
+        classes = [_as_dict(cls) for cls in context.get('classes', [])]
         
         # Case-insensitive search
         class_name_lower = class_name.lower()
@@ -363,7 +393,7 @@ class EnhancedCodeAnalyzer:
         callers = []
         
         # Get all functions from context
-        functions = context.get('functions', [])
+        functions = [_as_dict(func) for func in context.get('functions', [])]
         
         # Look for callers
         for func in functions:
@@ -1189,4 +1219,31 @@ class GenericCodeParser(BaseCodeParser):
                 'functions': [],
                 'classes': [],
                 'error': f"Error parsing code: {str(e)}"
-            }
\ No newline at end of file
+            }
+
+
+def _as_dict(entity):
+    """Context entities may be records such as FunctionSummary; explanations read them as dicts"""
+    return entity._asdict() if hasattr(entity, '_asdict') else entity
+
+
+def _analyze_file_task(task):
+    """
+    Analyze a single file in a pool worker
+    
+    Module-level so it can be shipped to worker processes.
+    
+    Args:
+        task (tuple): (config, file_path, content, language)
+        
+    Returns:
+        dict: File analysis results, or None on failure
+    """
+    global _worker_analyzer
+    config, file_path, content, language = task
+    
+    # Parsers are built once per worker rather than pickled with every task
+    if _worker_analyzer is None:
+        _worker_analyzer = EnhancedCodeAnalyzer(config)
+        
+    return _worker_analyzer.analyze_file(file_path, content, language)
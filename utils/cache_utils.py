@@ -0,0 +1,67 @@
+# CodingAssistant/utils/cache_utils.py
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with a bounded number of entries
+    """
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Look up a key and mark it as most recently used
+
+        Args:
+            key (hashable): Cache key
+            default (any, optional): Value returned on a miss
+
+        Returns:
+            any: Cached value or default
+        """
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def put(self, key, value):
+        """
+        Insert a value, evicting the least recently used entries if full
+
+        Args:
+            key (hashable): Cache key
+            value (any): Value to store
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def resize(self, maxsize):
+        """Change the capacity, evicting entries if it shrank"""
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+def file_cache_key(path, mtime_ns, size):
+    """Key that changes whenever a file is rewritten: (path, mtime_ns, size)"""
+    return (str(path), mtime_ns, size)
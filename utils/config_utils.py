@@ -49,6 +49,8 @@ def _default_config():
         "repository_integration": {
             "storage_dir": "repositories",
             "max_repo_size_mb": 100,
+            "max_workers": None,
+            "parallel_min_files": 16,
             "index_file_extensions": [".py", ".js", ".jsx", ".ts", ".tsx", ".java", ".c", ".cpp", ".h", ".hpp", ".cs", ".go", ".rs"],
             "ignore_patterns": ["node_modules", "venv", ".git", "__pycache__", "*.min.js"]
         },
@@ -56,24 +58,52 @@ def _default_config():
             "enable_syntax_parsing": True,
             "enable_semantic_analysis": True,
             "max_files_to_analyze": 1000,
-            "line_length_limit": 120
+            "line_length_limit": 120,
+            "enable_ast_cache": False,
+            "ast_cache_dir": "~/.cache/coding-assistant/ast-cache",
+            "lru_cache_size": 2048,
+            "lru_max_file_size_mb": 4,
+            "max_workers": None,
+            "parallel_min_files": 16,
+            "io_workers": None,
+            "python_parser": "tree-sitter",
+            "enable_incremental_index": False,
+            "incremental_index_path": "~/.cache/coding-assistant/incremental.sqlite",
+            "skip_dirs": [".git", "node_modules", "venv", ".venv", "__pycache__", "dist", "build"]
         },
         "context_management": {
             "storage_dir": "sessions",
+            "snapshot_interval": 50,
+            "flush_delay": 0.5,
+            "max_history": 200,
+            "session_format": "msgpack",
+            "fsync_sessions": False,
             "max_context_items": 50,
-            "relevance_threshold": 0.5
+            "relevance_threshold": 0.5,
+            "use_igraph": True,
+            "graph_format": "pickle"
         },
         "reasoning": {
             "model": "claude-3-sonnet-20240229",
             "max_tokens": 4000,
             "temperature": 0.7,
             "top_p": 0.9,
-            "enable_heuristics": True
+            "enable_heuristics": True,
+            "heuristics_cache_size": 512,
+            "max_heuristics_size": 200000,
+            "llm_cache_size": 256,
+            "llm_cache_ttl": 3600,
+            "llm_cache_max_temperature": 0.0,
+            "max_concurrency": 8,
+            "max_retries": 3,
+            "endpoints": []
         },
         "interaction": {
             "response_format": "markdown",
             "code_highlighting": True,
-            "max_suggestions": 5
+            "max_suggestions": 5,
+            "query_cache_size": 1024,
+            "response_cache_size": 128
         },
         "logging": {
             "level": "INFO",
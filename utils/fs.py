@@ -0,0 +1,154 @@
+# CodingAssistant/utils/fs.py
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+# Directories that never contain source worth analyzing
+SKIP_DIRS = frozenset({'.git', 'node_modules', 'venv', '.venv', '__pycache__', 'dist', 'build'})
+
+class FileInfo(NamedTuple):
+    """A regular file found while walking a repository"""
+    path: Path
+    suffix: str
+    size: int
+    mtime_ns: int
+
+
+def skip_dirs_from_config(config):
+    """
+    Compose the set of directory names to prune
+
+    Args:
+        config (dict): Component config; `skip_dirs` and the literal (non-glob)
+            entries of `ignore_patterns` are added to SKIP_DIRS
+
+    Returns:
+        frozenset: Directory names
+    """
+    extra = set(config.get('skip_dirs') or [])
+    extra.update(p for p in config.get('ignore_patterns') or [] if '*' not in p)
+    return SKIP_DIRS | extra
+
+
+def walk_repo(repo_path, skip_dirs=SKIP_DIRS):
+    """
+    List all files in a repository in a single scandir pass
+
+    Directories whose name is in skip_dirs are pruned without being entered,
+    so nothing under e.g. .git/objects is ever listed or stat'ed.
+
+    Args:
+        repo_path (str): Path to the repository
+        skip_dirs (frozenset, optional): Directory names to prune
+
+    Returns:
+        list: FileInfo for every regular file
+    """
+    logger = logging.getLogger(__name__)
+    files = []
+    stack = [str(repo_path)]
+
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in skip_dirs:
+                                stack.append(entry.path)
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            files.append(FileInfo(
+                                Path(entry.path),
+                                os.path.splitext(entry.name)[1].lower(),
+                                stat.st_size,
+                                stat.st_mtime_ns
+                            ))
+                    except OSError as e:
+                        logger.debug(f"Skipping {entry.path}: {e}")
+        except OSError as e:
+            logger.warning(f"Error reading directory {directory}: {e}")
+
+    return files
+
+
+def file_info(path):
+    """
+    Build a FileInfo for a single path
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        FileInfo: File information
+    """
+    path = Path(path)
+    stat = path.stat()
+    return FileInfo(path, path.suffix.lower(), stat.st_size, stat.st_mtime_ns)
+
+
+def relative_path(path, prefix):
+    """
+    Path string relative to a directory, by slicing off its prefix
+
+    Cheaper than Path.relative_to, which compares every path component.
+
+    Args:
+        path (Path): Path under the directory
+        prefix (str): Directory path ending in a separator, e.g. os.path.join(repo, '')
+
+    Returns:
+        str: Relative path
+    """
+    path = str(path)
+    if path.startswith(prefix):
+        return path[len(prefix):]
+    return str(Path(path).relative_to(prefix))
+
+
+def _read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def read_files(paths, max_workers=None, window=64):
+    """
+    Read files ahead of the consumer on a thread pool
+
+    At most `window` reads are in flight, so memory stays bounded while disk
+    latency overlaps with whatever the caller does with each file.
+
+    Args:
+        paths (iterable): Paths to read
+        max_workers (int, optional): I/O threads, default min(32, 4 * cpu_count)
+        window (int, optional): Maximum number of reads in flight
+
+    Yields:
+        tuple: (path, data, error) in input order; data is None when error is set
+    """
+    max_workers = max_workers or min(32, 4 * (os.cpu_count() or 1))
+    paths = iter(paths)
+    in_flight = deque()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for path in paths:
+            in_flight.append((path, pool.submit(_read_bytes, path)))
+            if len(in_flight) >= window:
+                break
+
+        while in_flight:
+            path, future = in_flight.popleft()
+
+            # Top the window back up before blocking on the oldest read
+            for next_path in paths:
+                in_flight.append((next_path, pool.submit(_read_bytes, next_path)))
+                break
+
+            try:
+                yield path, future.result(), None
+            except OSError as e:
+                yield path, None, e
@@ -0,0 +1,42 @@
+# CodingAssistant/utils/json_utils.py
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(obj, indent=False):
+    """
+    Serialize an object to UTF-8 JSON bytes, with orjson when it is installed
+
+    Args:
+        obj (any): JSON-compatible object
+        indent (bool, optional): Pretty-print with two-space indentation
+
+    Returns:
+        bytes: Encoded JSON
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
+
+
+def loads(data):
+    """
+    Parse JSON from bytes or str
+
+    Args:
+        data (bytes): Encoded JSON
+
+    Returns:
+        any: Decoded object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+
+    return json.loads(data)
@@ -0,0 +1,107 @@
+# CodingAssistant/utils/pattern_set.py
+import logging
+import re
+import threading
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# Hyperscan's \w, \s and \b are ASCII-only, and unlike re its \s leaves out the
+# \x1c-\x1f separators, so text containing any of these is scanned with re
+_HYPERSCAN_UNSAFE_RE = re.compile(r'[^\x00-\x1b\x20-\x7f]')
+
+class PatternSet:
+    """
+    Ordered regexes answering "which is the first pattern that matches anywhere"
+
+    With python-hyperscan installed, every pattern is scanned in a single pass
+    and the lowest matching index wins, which is what searching the patterns one
+    by one in order returns. Without it, or for text Hyperscan would treat
+    differently, the patterns are searched one by one with re.
+    """
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns (list): Compiled re patterns, highest priority first
+        """
+        self.patterns = list(patterns)
+        self._database = None
+        self._compiled = False
+        self._lock = threading.Lock()
+        # Hyperscan scratch space may only be used by one scan at a time
+        self._local = threading.local()
+
+    def first_match(self, text):
+        """
+        Find the highest priority pattern that matches text
+
+        Args:
+            text (str): Text to search
+
+        Returns:
+            int: Index of the pattern, or None if none matches
+        """
+        database = self._hyperscan_database() if not _HYPERSCAN_UNSAFE_RE.search(text) else None
+
+        if database is None:
+            for index, pattern in enumerate(self.patterns):
+                if pattern.search(text):
+                    return index
+            return None
+
+        matches = []
+        database.scan(
+            text.encode(),
+            match_event_handler=lambda pattern_id, start, end, flags, context: matches.append(pattern_id),
+            scratch=self._scratch(database)
+        )
+        return min(matches) if matches else None
+
+    def _hyperscan_database(self):
+        """Compile the patterns into one Hyperscan database on first use"""
+        if self._compiled:
+            return self._database
+
+        with self._lock:
+            if not self._compiled:
+                self._database = self._compile()
+                self._compiled = True
+
+        return self._database
+
+    def _compile(self):
+        if hyperscan is None:
+            return None
+
+        try:
+            flags = []
+            for pattern in self.patterns:
+                pattern_flags = hyperscan.HS_FLAG_SINGLEMATCH
+                if pattern.flags & re.IGNORECASE:
+                    pattern_flags |= hyperscan.HS_FLAG_CASELESS
+                if pattern.flags & re.MULTILINE:
+                    pattern_flags |= hyperscan.HS_FLAG_MULTILINE
+                if pattern.flags & re.DOTALL:
+                    pattern_flags |= hyperscan.HS_FLAG_DOTALL
+                flags.append(pattern_flags)
+
+            database = hyperscan.Database()
+            database.compile(
+                expressions=[pattern.pattern.encode() for pattern in self.patterns],
+                ids=list(range(len(self.patterns))),
+                elements=len(self.patterns),
+                flags=flags
+            )
+            return database
+
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Falling back to re for pattern matching: {e}")
+            return None
+
+    def _scratch(self, database):
+        scratch = getattr(self._local, 'scratch', None)
+        if scratch is None:
+            scratch = self._local.scratch = hyperscan.Scratch(database)
+        return scratch
@@ -0,0 +1,30 @@
+# CodingAssistant/utils/process_pool.py
+from concurrent.futures import ProcessPoolExecutor
+
+# Worker pools for CPU-bound parsing, shared by the analyzers and created on
+# first use. Keyed by worker count, so components configured with different
+# max_workers each keep their pool instead of respawning a single shared one
+_process_pools = {}
+
+
+def get_process_pool(max_workers):
+    """Return the shared process pool with max_workers workers, creating it on first use"""
+    pool = _process_pools.get(max_workers)
+    if pool is None:
+        pool = _process_pools[max_workers] = ProcessPoolExecutor(max_workers=max_workers)
+        
+    return pool
+
+
+def shutdown_process_pool(max_workers=None):
+    """
+    Discard shared process pools
+
+    Args:
+        max_workers (int, optional): Discard only the pool of this size; all pools by default
+    """
+    sizes = list(_process_pools) if max_workers is None else [max_workers]
+    for size in sizes:
+        pool = _process_pools.pop(size, None)
+        if pool is not None:
+            pool.shutdown(wait=False)